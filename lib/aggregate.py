@@ -18,16 +18,14 @@
 import json
 import uuid
 
-import sarif_om as om
-from jschema_to_python.to_json import to_json
-
 import lib.config as config
+import lib.sarif_writer as sarif_writer
 
 
 def jsonl_aggregate(run_data_list, out_file_name):
     """Produce aggregated report in jsonl format
 
-    :param run_data_list: List of run data after parsing the sarif files
+    :param run_data_list: List or generator of run data after parsing the sarif files
     :param out_file_name: Output filename
     """
     if not run_data_list or not out_file_name:
@@ -39,22 +37,13 @@ def jsonl_aggregate(run_data_list, out_file_name):
 
 
 def sarif_aggregate(run_data_list, out_sarif_name):
-    """
+    """Produce aggregated report in sarif format. The runs are written one at
+    a time so run_data_list can be a generator
 
-    :param run_data_list:
-    :param out_sarif_name:
-    :return:
+    :param run_data_list: List of run data after parsing the sarif files
+    :param out_sarif_name: Output filename
     """
     log_uuid = str(uuid.uuid4())
     run_uuid = config.get("run_uuid")
-    log = om.SarifLog(
-        schema_uri="https://raw.githubusercontent.com/oasis-tcs/sarif-spec/master/Schemata/sarif-schema-2.1.0.json",
-        version="2.1.0",
-        inline_external_properties=[
-            om.ExternalProperties(guid=log_uuid, run_guid=run_uuid)
-        ],
-        runs=run_data_list,
-    )
-    serialized_log = to_json(log)
     with open(out_sarif_name, "w") as outfile:
-        outfile.write(serialized_log)
+        sarif_writer.write_log(outfile, run_data_list, log_uuid, run_uuid)
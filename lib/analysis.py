@@ -15,12 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with Scan.  If not, see <https://www.gnu.org/licenses/>.
 
-import json
-
 from tabulate import tabulate
 
 import lib.aggregate as aggregate
 import lib.config as config
+import lib.json_stream as json_stream
 from lib.logger import LOG
 
 
@@ -37,6 +36,26 @@ def find_tool_shortname(desc):
     return desc
 
 
+def iter_runs(sarif_files):
+    """Read the runs from the SARIF files one at a time so that the results of
+    only a single run are held in memory
+
+    :param sarif_files: List of generated sarif report files
+    """
+    for sf in sarif_files:
+        count = 0
+        with open(sf, mode="r") as report_file:
+            try:
+                for run in json_stream.JSONStream(report_file).iter_path(["runs"]):
+                    count += 1
+                    yield run
+            except ValueError as e:
+                LOG.debug(e)
+        # skip this file if the data is empty
+        if not count:
+            LOG.warn("Report file {} is invalid. Skipping ...".format(sf))
+
+
 def summary(sarif_files, aggregate_file=None, override_rules={}):
     """Generate overall scan summary based on the generated
     SARIF file
@@ -48,58 +67,56 @@ def summary(sarif_files, aggregate_file=None, override_rules={}):
     """
     report_summary = {}
     build_status = "pass"
-    # This is the list of all runs which will get stored as an aggregate
-    run_data_list = []
-    for sf in sarif_files:
-        with open(sf, mode="r") as report_file:
-            report_data = json.loads(report_file.read())
-            # skip this file if the data is empty
-            if not report_data or not report_data.get("runs"):
-                LOG.warn("Report file {} is invalid. Skipping ...".format(sf))
-                continue
-            # Iterate through all the runs
-            for run in report_data["runs"]:
-                # Add it to the run data list for aggregation
-                run_data_list.append(run)
-                tool_desc = run["tool"]["driver"]["name"]
-                tool_name = tool_desc
-                # Initialise
-                report_summary[tool_name] = {
-                    "tool": tool_desc,
-                    "critical": 0,
-                    "high": 0,
-                    "medium": 0,
-                    "low": 0,
-                    "status": "✅",
-                }
-                results = run.get("results", [])
-                metrics = run.get("properties", {}).get("metrics", None)
-                # If the result includes metrics use it. If not compute it
-                if metrics:
-                    report_summary[tool_name].update(metrics)
-                    report_summary[tool_name].pop("total", None)
-                else:
-                    for aresult in results:
-                        sev = aresult["properties"]["issue_severity"].lower()
-                        report_summary[tool_name][sev] += 1
-                # Compare against the build break rule to determine status
-                default_rules = config.get("build_break_rules").get("default")
-                tool_rules = config.get("build_break_rules").get(tool_name, {})
-                build_break_rules = {**default_rules, **tool_rules, **override_rules}
-                for rsev in ["critical", "high", "medium", "low"]:
-                    if build_break_rules.get("max_" + rsev) is not None:
-                        if (
-                            report_summary.get(tool_name).get(rsev)
-                            > build_break_rules["max_" + rsev]
-                        ):
-                            report_summary[tool_name]["status"] = "❌"
-                            build_status = "fail"
+
+    def summarise_runs():
+        nonlocal build_status
+        # Iterate through all the runs
+        for run in iter_runs(sarif_files):
+            tool_desc = run["tool"]["driver"]["name"]
+            tool_name = tool_desc
+            # Initialise
+            report_summary[tool_name] = {
+                "tool": tool_desc,
+                "critical": 0,
+                "high": 0,
+                "medium": 0,
+                "low": 0,
+                "status": "✅",
+            }
+            results = run.get("results", [])
+            metrics = run.get("properties", {}).get("metrics", None)
+            # If the result includes metrics use it. If not compute it
+            if metrics:
+                report_summary[tool_name].update(metrics)
+                report_summary[tool_name].pop("total", None)
+            else:
+                for aresult in results:
+                    sev = aresult["properties"]["issue_severity"].lower()
+                    report_summary[tool_name][sev] += 1
+            # Compare against the build break rule to determine status
+            default_rules = config.get("build_break_rules").get("default")
+            tool_rules = config.get("build_break_rules").get(tool_name, {})
+            build_break_rules = {**default_rules, **tool_rules, **override_rules}
+            for rsev in ["critical", "high", "medium", "low"]:
+                if build_break_rules.get("max_" + rsev) is not None:
+                    if (
+                        report_summary.get(tool_name).get(rsev)
+                        > build_break_rules["max_" + rsev]
+                    ):
+                        report_summary[tool_name]["status"] = "❌"
+                        build_status = "fail"
+            yield run
+
     # Should we store the aggregate data
     if aggregate_file:
+        # The runs are written to the aggregate as they get summarised
         # agg_sarif_file = aggregate_file.replace(".json", ".sarif")
         # aggregate.sarif_aggregate(run_data_list, agg_sarif_file)
-        aggregate.jsonl_aggregate(run_data_list, aggregate_file)
+        aggregate.jsonl_aggregate(summarise_runs(), aggregate_file)
         LOG.debug("Aggregate report written to {}\n".format(aggregate_file))
+    else:
+        for _ in summarise_runs():
+            pass
     return report_summary, build_status
 
 
@@ -0,0 +1,115 @@
+# This file is part of Scan.
+
+# Scan is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Scan is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Scan.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Persistent caches reused across scans of the same source directory
+"""
+
+import json
+import os
+import tempfile
+from hashlib import blake2b
+
+import lib.config as config
+from lib.logger import LOG
+
+# Bump this to invalidate the caches written by older versions
+CACHE_VERSION = 1
+
+
+def get_cache_dir():
+    """
+    Method to find the cache directory. SCAN_CACHE_DIR takes precedence over
+    the .cache directory inside the reports directory
+
+    :return: Cache directory or None if caching is not possible
+    """
+    cache_dir = config.get("SCAN_CACHE_DIR")
+    if not cache_dir and config.get("SAST_SCAN_REPORTS_DIR"):
+        cache_dir = os.path.join(config.get("SAST_SCAN_REPORTS_DIR"), ".cache")
+    return cache_dir
+
+
+def hash_key(*parts):
+    """
+    Method to compute a short hash for the given parts
+
+    :return: Hex digest
+    """
+    h = blake2b(digest_size=16)
+    for part in parts:
+        h.update(str(part).encode("utf-8", errors="ignore"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def get_cache_file(name, *key_parts, ext="json"):
+    """
+    Method to construct the cache file name
+
+    :param name: Name of the cache. Eg: inventory
+    :param key_parts: Values that identify the cache entry. Eg: source directory
+    :param ext: File extension
+    :return: Full path to the cache file or None if caching is not possible
+    """
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        LOG.debug(e)
+        return None
+    return os.path.join(cache_dir, "{}-{}.{}".format(name, hash_key(*key_parts), ext))
+
+
+def load(cache_file):
+    """
+    Method to load the cached data
+
+    :param cache_file: Cache file name
+    :return: Cached data or None if the cache is missing or outdated
+    """
+    if not cache_file or not os.path.isfile(cache_file):
+        return None
+    try:
+        with open(cache_file, mode="r") as fp:
+            data = json.load(fp)
+        if data.get("version") != CACHE_VERSION:
+            return None
+        return data
+    except (OSError, ValueError, AttributeError) as e:
+        LOG.debug("Ignoring the cache {}: {}".format(cache_file, e))
+        return None
+
+
+def save(cache_file, data):
+    """
+    Method to store the data in the cache. The file is replaced atomically so
+    that concurrent scans never see a partial cache
+
+    :param cache_file: Cache file name
+    :param data: Data to store
+    """
+    if not cache_file:
+        return
+    data["version"] = CACHE_VERSION
+    try:
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(cache_file))
+        with os.fdopen(fd, mode="w") as fp:
+            json.dump(data, fp)
+        os.replace(tmp_name, cache_file)
+    except OSError as e:
+        LOG.debug("Unable to write the cache {}: {}".format(cache_file, e))
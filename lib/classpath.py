@@ -0,0 +1,445 @@
+# This file is part of Scan.
+
+# Scan is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Scan is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Scan.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Dependency classpath for the java class analysers. The dependencies declared
+in the maven and gradle build files are resolved along with their transitive
+dependencies against the local maven and gradle caches. The result is cached
+by the hash of the build files
+"""
+
+import os
+import re
+from collections import deque
+
+from defusedxml.ElementTree import parse
+
+import lib.cache as cache
+import lib.utils as utils
+from lib.logger import LOG
+
+BUILD_FILES = ["pom.xml", "build.gradle", "build.gradle.kts"]
+
+# Directories with the build output of maven and gradle
+BUILD_OUTPUT_DIRS = ["target", "build"]
+
+# Scopes that are not needed to analyse the main classes
+SKIP_SCOPES = ("test", "import")
+
+# Limit for the nesting of parent poms
+MAX_PARENT_DEPTH = 10
+
+GRADLE_DEP_PATTERN = re.compile(
+    r"""\b(?:api|implementation|compile|compileOnly|runtime|runtimeOnly|providedCompile|providedRuntime)\s*\(?\s*['"]([^'":\s]+):([^'":\s]+):([^'":@\s]+)[^'"]*['"]"""
+)
+
+PROPERTY_PATTERN = re.compile(r"\$\{([^}]+)\}")
+
+
+def get_maven_repo():
+    return os.path.join(os.environ.get("HOME", ""), ".m2", "repository")
+
+
+def get_gradle_cache():
+    gradle_home = os.environ.get("GRADLE_USER_HOME") or os.path.join(
+        os.environ.get("HOME", ""), ".gradle"
+    )
+    return os.path.join(gradle_home, "caches", "modules-2", "files-2.1")
+
+
+def find_artifact(group_id, artifact_id, version, ext):
+    """
+    Method to locate an artifact in the local maven repository or the gradle cache
+
+    :param group_id: Group id
+    :param artifact_id: Artifact id
+    :param version: Version
+    :param ext: jar or pom
+    :return: Full path or None if the artifact was never downloaded
+    """
+    fname = "{}-{}.{}".format(artifact_id, version, ext)
+    path = os.path.join(
+        get_maven_repo(), *group_id.split("."), artifact_id, version, fname
+    )
+    if os.path.isfile(path):
+        return path
+    # Gradle keeps every file under a directory named after its sha1
+    gradle_dir = os.path.join(get_gradle_cache(), group_id, artifact_id, version)
+    try:
+        for sha_dir in os.listdir(gradle_dir):
+            path = os.path.join(gradle_dir, sha_dir, fname)
+            if os.path.isfile(path):
+                return path
+    except OSError:
+        pass
+    return None
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def find_child(element, name):
+    for child in element:
+        if local_name(child.tag) == name:
+            return child
+    return None
+
+
+def child_text(element, name):
+    child = find_child(element, name)
+    if child is None or child.text is None:
+        return None
+    return child.text.strip()
+
+
+def parse_dependencies(element):
+    """
+    Method to parse the dependency elements under the given element
+
+    :param element: dependencies element
+    :return: List of dependency dicts
+    """
+    dependencies = []
+    if element is None:
+        return dependencies
+    for dep in element:
+        if local_name(dep.tag) != "dependency":
+            continue
+        dependencies.append(
+            {
+                "groupId": child_text(dep, "groupId"),
+                "artifactId": child_text(dep, "artifactId"),
+                "version": child_text(dep, "version"),
+                "scope": child_text(dep, "scope") or "compile",
+                "type": child_text(dep, "type") or "jar",
+                "optional": child_text(dep, "optional") == "true",
+            }
+        )
+    return dependencies
+
+
+class PomResolver(object):
+    """
+    Minimal maven model builder. Properties, parent poms, dependency management
+    and imported boms are taken into account to find the dependency versions
+    """
+
+    def __init__(self):
+        self.models = {}
+
+    def read_pom(self, pom_file):
+        """
+        Method to read the raw model from a pom file
+
+        :param pom_file: pom file
+        :return: Model dict or None if the file cannot be parsed
+        """
+        try:
+            root = parse(pom_file).getroot()
+        except Exception as e:
+            LOG.debug("Unable to parse {}: {}".format(pom_file, e))
+            return None
+        model = {
+            "groupId": child_text(root, "groupId"),
+            "artifactId": child_text(root, "artifactId"),
+            "version": child_text(root, "version"),
+            "properties": {},
+            "parent": None,
+            "managed": [],
+            "dependencies": parse_dependencies(find_child(root, "dependencies")),
+        }
+        dep_management = find_child(root, "dependencyManagement")
+        if dep_management is not None:
+            model["managed"] = parse_dependencies(
+                find_child(dep_management, "dependencies")
+            )
+        properties = find_child(root, "properties")
+        if properties is not None:
+            for prop in properties:
+                model["properties"][local_name(prop.tag)] = (prop.text or "").strip()
+        parent = find_child(root, "parent")
+        if parent is not None:
+            model["parent"] = {
+                "groupId": child_text(parent, "groupId"),
+                "artifactId": child_text(parent, "artifactId"),
+                "version": child_text(parent, "version"),
+                "relativePath": child_text(parent, "relativePath") or "../pom.xml",
+            }
+            model["groupId"] = model["groupId"] or model["parent"]["groupId"]
+            model["version"] = model["version"] or model["parent"]["version"]
+        return model
+
+    def find_parent_pom(self, pom_file, parent):
+        local_pom = os.path.normpath(
+            os.path.join(os.path.dirname(pom_file), parent["relativePath"])
+        )
+        if os.path.isdir(local_pom):
+            local_pom = os.path.join(local_pom, "pom.xml")
+        if os.path.isfile(local_pom):
+            model = self.read_pom(local_pom)
+            if (
+                model
+                and model["groupId"] == parent["groupId"]
+                and model["artifactId"] == parent["artifactId"]
+            ):
+                return local_pom
+        return find_artifact(
+            parent["groupId"], parent["artifactId"], parent["version"], "pom"
+        )
+
+    def load(self, pom_file, depth=0):
+        """
+        Method to build the effective model for the pom file
+
+        :param pom_file: pom file
+        :param depth: Nesting level of the parent poms
+        :return: Model dict with the inherited properties and managed versions
+        """
+        if pom_file in self.models:
+            return self.models[pom_file]
+        model = self.read_pom(pom_file)
+        if not model:
+            self.models[pom_file] = None
+            return None
+        properties = {}
+        managed = {}
+        parent = model["parent"]
+        if parent and depth < MAX_PARENT_DEPTH:
+            parent_pom = self.find_parent_pom(pom_file, parent)
+            parent_model = self.load(parent_pom, depth + 1) if parent_pom else None
+            if parent_model:
+                properties.update(parent_model["properties"])
+                managed.update(parent_model["managed_versions"])
+                inherited = {
+                    (d["groupId"], d["artifactId"]) for d in model["dependencies"]
+                }
+                for dep in parent_model["dependencies"]:
+                    if (dep["groupId"], dep["artifactId"]) not in inherited:
+                        model["dependencies"].append(dep)
+        properties.update(model["properties"])
+        for key in ("groupId", "artifactId", "version"):
+            if model[key]:
+                properties["project." + key] = model[key]
+                properties[key] = model[key]
+        if parent:
+            properties["project.parent.version"] = parent["version"]
+        model["properties"] = properties
+        for dep in model["managed"]:
+            dep = self.interpolate(dep, properties)
+            if dep["scope"] == "import" and dep["type"] == "pom":
+                bom_pom = find_artifact(
+                    dep["groupId"], dep["artifactId"], dep["version"], "pom"
+                )
+                bom_model = self.load(bom_pom, depth + 1) if bom_pom else None
+                if bom_model:
+                    for key, version in bom_model["managed_versions"].items():
+                        managed.setdefault(key, version)
+            elif dep["version"]:
+                managed[(dep["groupId"], dep["artifactId"])] = dep["version"]
+        model["managed_versions"] = managed
+        model["dependencies"] = [
+            self.interpolate(dep, properties) for dep in model["dependencies"]
+        ]
+        self.models[pom_file] = model
+        return model
+
+    def interpolate(self, dep, properties):
+        dep = dict(dep)
+        for key in ("groupId", "artifactId", "version"):
+            value = dep.get(key)
+            # Properties may refer to other properties
+            for _ in range(5):
+                if not value or "${" not in value:
+                    break
+                value = PROPERTY_PATTERN.sub(
+                    lambda m: properties.get(m.group(1), m.group(0)), value
+                )
+            dep[key] = value
+        return dep
+
+    def get_dependencies(self, pom_file):
+        """
+        Method to find the dependencies declared in the pom file with the
+        versions resolved
+
+        :param pom_file: pom file
+        :return: List of (groupId, artifactId, version, optional) tuples
+        """
+        model = self.load(pom_file)
+        if not model:
+            return []
+        result = []
+        for dep in model["dependencies"]:
+            if dep["scope"] in SKIP_SCOPES or dep["type"] not in ("jar", "bundle"):
+                continue
+            version = dep["version"] or model["managed_versions"].get(
+                (dep["groupId"], dep["artifactId"])
+            )
+            if not dep["groupId"] or not dep["artifactId"] or not version:
+                continue
+            if "${" in version or version.startswith(("[", "(")):
+                continue
+            result.append((dep["groupId"], dep["artifactId"], version, dep["optional"]))
+        return result
+
+
+def parse_gradle_dependencies(build_file):
+    """
+    Method to find the dependencies declared with the group:name:version
+    notation in a gradle build file
+
+    :param build_file: build.gradle or build.gradle.kts
+    :return: List of (groupId, artifactId, version, optional) tuples
+    """
+    try:
+        with open(build_file, encoding="utf-8", errors="ignore") as fp:
+            content = fp.read()
+    except OSError as e:
+        LOG.debug(e)
+        return []
+    return [
+        (g, a, v, False)
+        for g, a, v in GRADLE_DEP_PATTERN.findall(content)
+        if "$" not in v and "+" not in v
+    ]
+
+
+def resolve_dependency_jars(build_files, unresolved=None):
+    """
+    Method to resolve the jars for the dependencies declared in the build
+    files along with their transitive dependencies. Nearest declaration wins
+    like maven
+
+    :param build_files: List of build files
+    :param unresolved: Optional list to collect the [group, artifact, version]
+    of the dependencies that are not available locally
+    :return: List of jar files
+    """
+    resolver = PomResolver()
+    queue = deque()
+    for build_file in build_files:
+        if build_file.endswith(".xml"):
+            deps = resolver.get_dependencies(build_file)
+        else:
+            deps = parse_gradle_dependencies(build_file)
+        queue.extend(deps)
+    seen = set()
+    jars = []
+    while queue:
+        group_id, artifact_id, version, _ = queue.popleft()
+        if (group_id, artifact_id) in seen:
+            continue
+        seen.add((group_id, artifact_id))
+        jar = find_artifact(group_id, artifact_id, version, "jar")
+        if jar:
+            jars.append(jar)
+        pom = find_artifact(group_id, artifact_id, version, "pom")
+        if pom:
+            queue.extend(dep for dep in resolver.get_dependencies(pom) if not dep[3])
+        elif not jar and unresolved is not None:
+            unresolved.append([group_id, artifact_id, version])
+    return jars
+
+
+def find_output_jars(src, build_files):
+    """
+    Method to find the jars in the build output and the ones checked into the repo
+
+    :param src: Source directory
+    :param build_files: List of build files
+    :return: List of jar files
+    """
+    jars = utils.get_inventory(src).find_files(".jar")
+    for build_dir in sorted({os.path.dirname(f) for f in build_files}):
+        for output_dir in BUILD_OUTPUT_DIRS:
+            output_path = os.path.join(build_dir, output_dir)
+            if os.path.isdir(output_path):
+                jars += [f for f in utils.walk_files(output_path) if f.endswith(".jar")]
+    return jars
+
+
+def get_build_files(src):
+    build_files = []
+    inventory = utils.get_inventory(src)
+    for name in BUILD_FILES:
+        build_files += [
+            f for f in inventory.find_files(name) if os.path.basename(f) == name
+        ]
+    return sorted(build_files)
+
+
+def get_build_files_key(build_files):
+    parts = []
+    for build_file in build_files:
+        try:
+            with open(build_file, mode="rb") as fp:
+                parts.append(build_file + ":" + cache.hash_key(fp.read()))
+        except OSError:
+            parts.append(build_file)
+    return parts
+
+
+def is_cache_valid(cached):
+    """
+    Method to check if the cached classpath can be used. The dependencies
+    that were missing when the classpath was resolved could have been
+    downloaded since
+
+    :param cached: Cached data with the jars and the unresolved dependencies
+    :return: True if every jar exists and none of the missing dependencies does
+    """
+    if not cached or not all(os.path.isfile(j) for j in cached.get("jars", [])):
+        return False
+    for group_id, artifact_id, version in cached.get("unresolved", []):
+        if find_artifact(group_id, artifact_id, version, "pom") or find_artifact(
+            group_id, artifact_id, version, "jar"
+        ):
+            return False
+    return True
+
+
+def resolve_classpath(src):
+    """
+    Method to find the classpath for the project. The dependency jars are
+    cached by the hash of the build files until any of the missing
+    dependencies becomes available. Every jar under the maven and gradle
+    caches is used when the project has no build files or when nothing could
+    be resolved
+
+    :param src: Source directory
+    :return: List of jar files
+    """
+    build_files = get_build_files(src)
+    if not build_files:
+        return utils.find_jar_files()
+    cache_file = cache.get_cache_file(
+        "classpath", src, get_maven_repo(), *get_build_files_key(build_files)
+    )
+    cached = cache.load(cache_file)
+    dependency_jars = None
+    if is_cache_valid(cached):
+        dependency_jars = cached["jars"]
+    if dependency_jars is None:
+        unresolved = []
+        dependency_jars = resolve_dependency_jars(build_files, unresolved)
+        if dependency_jars:
+            cache.save(cache_file, {"jars": dependency_jars, "unresolved": unresolved})
+    jars = dependency_jars + find_output_jars(src, build_files)
+    if not jars:
+        LOG.debug("Unable to resolve the classpath. Using all the jars in the cache")
+        return utils.find_jar_files()
+    # Remove duplicates preserving the order
+    return list(dict.fromkeys(jars))
@@ -14,33 +14,34 @@
 # along with Scan.  If not, see <https://www.gnu.org/licenses/>.
 
 import datetime
+import functools
 import io
 import json
 import os
 import pathlib
-import re
 import sys
+import urllib.parse
 import uuid
 
-import sarif_om as om
-from jschema_to_python.to_json import to_json
 from reporter.sarif import render_html
 
 import lib.config as config
 import lib.csv_parser as csv_parser
+import lib.json_stream as json_stream
+import lib.sarif_writer as sarif_writer
 import lib.xml_parser as xml_parser
 from lib.context import find_repo_details
 from lib.cwe import get_description, get_name
 from lib.issue import issue_from_dict
 from lib.logger import LOG
-from lib.utils import find_path_prefix, is_generic_package
-
-# from hashlib import blake2b
+from lib.snippet import snippets
+from lib.utils import find_path_prefix, is_generic_package, is_ignored_file
 
 TS_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
-# Line number hash size
-HASH_DIGEST_SIZE = config.get("HASH_DIGEST_SIZE", 8)
+# Prebuilt descriptions for the well known rule ids. Loaded on first use
+rules_pack_file = pathlib.Path(__file__).parent / "data" / "rules-pack.json"
+rules_pack = None
 
 
 def tweak_severity(tool_name, issue_dict):
@@ -67,93 +68,101 @@ def extract_from_file(tool_name, working_dir, report_file, file_path_list=None):
 
     :return issues, metrics, skips information
     """
-    issues = []
-    metrics = None
+    metrics = {}
     skips = []
+    issues = list(
+        iter_from_file(tool_name, working_dir, report_file, file_path_list, metrics)
+    )
+    return issues, metrics or None, skips
+
+
+def iter_from_file(
+    tool_name, working_dir, report_file, file_path_list=None, metrics=None
+):
+    """Read the issues from the report one at a time
+
+    :param tool_name: tool name
+    :param working_dir: Working directory
+    :param report_file: Report file
+    :param file_path_list: Full file path for any manipulation
+    :param metrics: Optional dict to be filled with any metrics in the report
+    """
     # If the tools did not produce any result do not crash
     if not os.path.isfile(report_file):
-        return issues, metrics, skips
+        return
     extn = pathlib.PurePosixPath(report_file).suffix
 
     with io.open(report_file, "r") as rfile:
         # Static check use jsonlines format, duh
         if tool_name == "staticcheck":
-            contents = rfile.read()
             try:
-                issues = [
-                    json.loads(str(item)) for item in contents.strip().split("\n")
-                ]
+                issues = [json.loads(line) for line in rfile if line.strip()]
             except json.decoder.JSONDecodeError:
                 LOG.warning(
                     "staticcheck produced no result since the project was not built before analysis!"
                 )
-            return issues, metrics, skips
+                return
+            yield from issues
+            return
         if extn == ".json":
+            count = 0
             try:
-                report_data = json.loads(rfile.read())
-            except json.decoder.JSONDecodeError:
-                return issues, metrics, skips
-            # Inspect uses vulnerabilities
-            if tool_name == "inspect":
-                file_name_prefix = ""
-                for v in report_data.get("vulnerabilities"):
-                    if not v:
-                        continue
-                    vuln = v["vulnerability"]
-                    location = {}
-                    if vuln.get("dataFlow") and vuln.get("dataFlow").get("dataFlow"):
-                        for l in vuln["dataFlow"]["dataFlow"]["list"]:
-                            if not is_generic_package(l["location"].get("fileName")):
-                                location = l["location"]
-                                break
-                    fileName = location.get("fileName")
-                    if fileName == "N/A":
-                        continue
-                    if not file_name_prefix:
-                        file_name_prefix = find_path_prefix(working_dir, fileName)
-                    issues.append(
-                        {
-                            "rule_id": vuln["category"],
-                            "title": vuln["title"],
-                            "description": vuln["description"],
-                            "score": vuln["score"],
-                            "severity": vuln["severity"],
-                            "line_number": location.get("lineNumber"),
-                            "filename": os.path.join(file_name_prefix, fileName),
-                            "first_found": vuln["firstVersionDetected"],
-                            "issue_confidence": "HIGH",
-                        }
-                    )
-            elif isinstance(report_data, list):
-                issues = report_data
-            else:
-                if tool_name == "checkov":
-                    issues = report_data.get("results", {}).get("failed_checks")
-                elif "sec_issues" in report_data:
-                    # NodeJsScan uses sec_issues
-                    sec_data = report_data["sec_issues"]
-                    for key, value in sec_data.items():
-                        if isinstance(value, list):
-                            issues = issues + value
-                        else:
-                            issues.append(value)
-                elif "Issues" in report_data:
-                    tmpL = report_data.get("Issues", [])
-                    if tmpL:
-                        issues += tmpL
-                    else:
-                        LOG.debug("%s produced no result" % tool_name)
-                elif "results" in report_data:
-                    tmpL = report_data.get("results", [])
-                    if tmpL:
-                        issues += tmpL
-                    else:
-                        LOG.debug("%s produced no result" % tool_name)
+                for issue in iter_json_issues(tool_name, working_dir, rfile):
+                    count += 1
+                    yield issue
+            except ValueError as e:
+                LOG.debug("Unable to read the report {}: {}".format(report_file, e))
+            if not count:
+                LOG.debug("%s produced no result" % tool_name)
         if extn == ".csv":
             headers, issues = csv_parser.get_report_data(rfile)
+            yield from issues
         if extn == ".xml":
-            issues, metrics = xml_parser.get_report_data(rfile, file_path_list)
-    return issues, metrics, skips
+            yield from xml_parser.iter_report_data(rfile, file_path_list, metrics)
+
+
+def iter_json_issues(tool_name, working_dir, rfile):
+    """Read the issues from the json report incrementally
+
+    :param tool_name: tool name
+    :param working_dir: Working directory
+    :param rfile: Report file object
+    """
+    if tool_name != "inspect":
+        yield from json_stream.iter_issues(rfile, tool_name)
+        return
+    # Inspect uses vulnerabilities
+    # Inspect reports paths relative to the source root of the module.
+    # Resolve the prefix once per file name
+    file_name_prefixes = {}
+    for v in json_stream.iter_issues(rfile, tool_name):
+        if not v:
+            continue
+        vuln = v["vulnerability"]
+        location = {}
+        if vuln.get("dataFlow") and vuln.get("dataFlow").get("dataFlow"):
+            for l in vuln["dataFlow"]["dataFlow"]["list"]:
+                if not is_generic_package(l["location"].get("fileName")):
+                    location = l["location"]
+                    break
+        fileName = location.get("fileName")
+        if fileName == "N/A":
+            continue
+        file_name_prefix = file_name_prefixes.get(fileName)
+        if file_name_prefix is None:
+            file_name_prefix = find_path_prefix(working_dir, fileName)
+            file_name_prefixes[fileName] = file_name_prefix
+        yield {
+            "rule_id": vuln["category"],
+            "title": vuln["title"],
+            "description": vuln["description"],
+            "score": vuln["score"],
+            "severity": vuln["severity"],
+            "line_number": location.get("lineNumber"),
+            "filename": os.path.join(file_name_prefix, fileName),
+            "first_found": vuln["firstVersionDetected"],
+            "issue_confidence": "HIGH",
+        }
 
 
 def convert_file(
@@ -168,17 +177,15 @@ def convert_file(
     :param converted_file: Converted file
     :param file_path_list: Full file path for any manipulation
 
-    :return serialized_log: SARIF output data
+    :return metrics: Number of results by severity
     """
-    issues, metrics, skips = extract_from_file(
-        tool_name, working_dir, report_file, file_path_list
-    )
+    issues = iter_from_file(tool_name, working_dir, report_file, file_path_list)
     return report(
         tool_name,
         tool_args,
         working_dir,
-        metrics,
-        skips,
+        None,
+        [],
         issues,
         converted_file,
         file_path_list,
@@ -206,7 +213,7 @@ def report(
     :param crep_fname: The output file name
     :param file_path_list: Full file path for any manipulation
 
-    :return serialized_log: SARIF output data
+    :return metrics: Number of results by severity
     """
     if not tool_args:
         tool_args = []
@@ -226,125 +233,111 @@ def report(
         "low": 0,
     }
 
-    total = 0
-    for issue in issues:
-        issue_dict = issue_from_dict(issue).as_dict()
-        rule_id = issue_dict.get("test_id")
-        # Is this rule ignored globally?
-        if rule_id in config.ignored_rules:
-            continue
-        total += 1
-        issue_severity = issue_dict["issue_severity"]
-        # Fix up severity for certain tools
-        issue_severity = tweak_severity(tool_name, issue_dict)
-        key = issue_severity.lower()
-        if not metrics.get(key):
-            metrics[key] = 0
-        metrics[key] += 1
-    metrics["total"] = total
     # working directory to use in the log
     WORKSPACE_PREFIX = config.get("WORKSPACE", None)
     wd_dir_log = WORKSPACE_PREFIX if WORKSPACE_PREFIX is not None else working_dir
     driver_name = config.tool_purpose_message.get(tool_name, tool_name)
     if tool_name != "inspect" and config.get("CI") or config.get("GITHUB_ACTIONS"):
         driver_name = "ShiftLeft " + driver_name
-    # Construct SARIF log
-    log = om.SarifLog(
-        schema_uri="https://raw.githubusercontent.com/oasis-tcs/sarif-spec/master/Schemata/sarif-schema-2.1.0.json",
-        version="2.1.0",
-        inline_external_properties=[
-            om.ExternalProperties(guid=log_uuid, run_guid=run_uuid)
-        ],
-        runs=[
-            om.Run(
-                automation_details=om.RunAutomationDetails(
-                    guid=log_uuid,
-                    description=om.Message(
-                        text="Static Analysis Security Test results using @ShiftLeft/sast-scan"
-                    ),
-                ),
-                tool=om.Tool(driver=om.ToolComponent(name=driver_name)),
-                invocations=[
-                    om.Invocation(
-                        end_time_utc=datetime.datetime.utcnow().strftime(TS_FORMAT),
-                        execution_successful=True,
-                        working_directory=om.ArtifactLocation(uri=to_uri(wd_dir_log)),
-                    )
-                ],
-                conversion={
-                    "tool": om.Tool(
-                        driver=om.ToolComponent(name="@ShiftLeft/sast-scan")
-                    ),
-                    "invocation": om.Invocation(
-                        execution_successful=True,
-                        command_line=tool_args_str,
-                        arguments=tool_args,
-                        working_directory=om.ArtifactLocation(uri=to_uri(wd_dir_log)),
-                        end_time_utc=datetime.datetime.utcnow().strftime(TS_FORMAT),
-                    ),
+    # Construct SARIF run
+    invocation = {
+        "executionSuccessful": True,
+        "endTimeUtc": datetime.datetime.utcnow().strftime(TS_FORMAT),
+        "workingDirectory": {"uri": to_uri(wd_dir_log)},
+    }
+    run = {
+        "tool": {"driver": {"name": driver_name}},
+        "conversion": {
+            "tool": {"driver": {"name": "@ShiftLeft/sast-scan"}},
+            "invocation": sarif_writer.omit_none(
+                {
+                    "arguments": tool_args,
+                    "executionSuccessful": True,
+                    "commandLine": tool_args_str,
+                    "endTimeUtc": datetime.datetime.utcnow().strftime(TS_FORMAT),
+                    "workingDirectory": {"uri": to_uri(wd_dir_log)},
+                }
+            ),
+        },
+        "invocations": [invocation],
+        "properties": {"metrics": metrics},
+        "results": [],
+        "automationDetails": {
+            "description": {
+                "text": "Static Analysis Security Test results using @ShiftLeft/sast-scan"
+            },
+            "guid": log_uuid,
+        },
+        "versionControlProvenance": [
+            sarif_writer.omit_none(
+                {
+                    "branch": repo_details["branch"],
+                    "repositoryUri": repo_details["repositoryUri"],
+                    "revisionId": repo_details["revisionId"],
                 },
-                properties={"metrics": metrics},
-                version_control_provenance=[
-                    om.VersionControlDetails(
-                        repository_uri=repo_details["repositoryUri"],
-                        branch=repo_details["branch"],
-                        revision_id=repo_details["revisionId"],
-                    )
-                ],
+                keep=("repositoryUri",),
             )
         ],
-    )
-
-    run = log.runs[0]
-    invocation = run.invocations[0]
+    }
 
     add_skipped_file_notifications(skips, invocation)
-    add_results(tool_name, issues, run, file_path_list, working_dir)
-
-    serialized_log = to_json(log)
-
-    if crep_fname:
-        html_file = crep_fname.replace(".sarif", ".html")
-        with io.open(crep_fname, "w") as fileobj:
-            fileobj.write(serialized_log)
-        render_html(json.loads(serialized_log), html_file)
-        if fileobj.name != sys.stdout.name:
-            LOG.debug(
-                "SARIF and HTML report written to file: %s, %s 👍",
-                fileobj.name,
-                html_file,
-            )
-    return serialized_log
+    try:
+        # Metrics get populated along with the results
+        add_results(tool_name, issues, run, file_path_list, working_dir)
+        if crep_fname:
+            html_file = crep_fname.replace(".sarif", ".html")
+            with io.open(crep_fname, "w") as fileobj:
+                sarif_writer.write_log(fileobj, [run], log_uuid, run_uuid)
+            # The html report reads the spooled results rather than the log
+            if html_file != crep_fname:
+                render_html(
+                    {
+                        "runs": [run],
+                        "inlineExternalProperties": sarif_writer.get_inline_properties(
+                            log_uuid, run_uuid
+                        ),
+                    },
+                    html_file,
+                )
+            if fileobj.name != sys.stdout.name:
+                LOG.debug(
+                    "SARIF and HTML report written to file: %s, %s 👍",
+                    fileobj.name,
+                    html_file,
+                )
+    finally:
+        if isinstance(run["results"], sarif_writer.ResultSpool):
+            run["results"].close()
+    return metrics
 
 
 def add_skipped_file_notifications(skips, invocation):
     """Method to add skipped files details to the output
 
     :param skips: List of files skipped by the tool
-    :param invocation: Invocation object for the given run
+    :param invocation: Invocation dict for the given run
     """
     if skips is None or len(skips) == 0:
         return
 
-    if invocation.tool_configuration_notifications is None:
-        invocation.tool_configuration_notifications = []
+    # Notifications precede the working directory in the log
+    working_directory = invocation.pop("workingDirectory", None)
+    notifications = invocation.setdefault("toolConfigurationNotifications", [])
+    if working_directory is not None:
+        invocation["workingDirectory"] = working_directory
 
     for skip in skips:
         (file_name, reason) = skip
 
-        notification = om.Notification(
-            level="error",
-            message=om.Message(text=reason),
-            locations=[
-                om.Location(
-                    physical_location=om.PhysicalLocation(
-                        artifact_location=om.ArtifactLocation(uri=to_uri(file_name))
-                    )
-                )
+        notification = {
+            "message": {"text": reason},
+            "level": "error",
+            "locations": [
+                {"physicalLocation": {"artifactLocation": {"uri": to_uri(file_name)}}}
             ],
-        )
+        }
 
-        invocation.tool_configuration_notifications.append(notification)
+        notifications.append(notification)
 
 
 def add_results(tool_name, issues, run, file_path_list=None, working_dir=None):
@@ -352,24 +345,56 @@ def add_results(tool_name, issues, run, file_path_list=None, working_dir=None):
 
     :param tool_name: tool name
     :param issues: Issues found
-    :param run: Run object
+    :param run: Run dict
     :param file_path_list: Full file path for any manipulation
     :param working_dir: Working directory
     """
-    if run.results is None:
-        run.results = []
+    # Results are spooled to disk since the rules precede them in the log
+    results = sarif_writer.ResultSpool()
+    run["results"] = results
+    metrics = run["properties"]["metrics"]
 
     rules = {}
     rule_indices = {}
-    for issue in issues:
-        result = create_result(
-            tool_name, issue, rules, rule_indices, file_path_list, working_dir
+    path_rewriter = PathRewriter.from_config(working_dir)
+
+    def flush(batch):
+        # Fingerprints for the consecutive findings in a file are computed together
+        fingerprints = get_fingerprints(
+            batch[0]["filename"], [i["line_number"] for i in batch], working_dir
         )
-        if result:
-            run.results.append(result)
+        for issue_dict in batch:
+            results.append(
+                create_result_from_dict(
+                    tool_name,
+                    issue_dict,
+                    rules,
+                    rule_indices,
+                    working_dir,
+                    path_rewriter,
+                    get_fingerprint_dict(fingerprints, issue_dict["line_number"]),
+                )
+            )
+        del batch[:]
+
+    # Each issue is normalised once and the same record is used for the
+    # metrics, rules and results. issues can therefore be a generator
+    batch = []
+    for issue in issues:
+        issue_dict = normalize_issue(tool_name, issue, working_dir)
+        if not issue_dict:
+            continue
+        metrics["total"] += 1
+        key = issue_dict["issue_severity"].lower()
+        metrics[key] = metrics.get(key, 0) + 1
+        if batch and batch[0]["filename"] != issue_dict["filename"]:
+            flush(batch)
+        batch.append(issue_dict)
+    if batch:
+        flush(batch)
 
     if len(rules) > 0:
-        run.tool.driver.rules = list(rules.values())
+        run["tool"]["driver"]["rules"] = list(rules.values())
 
 
 def create_result(tool_name, issue, rules, rule_indices, file_path_list, working_dir):
@@ -382,68 +407,200 @@ def create_result(tool_name, issue, rules, rule_indices, file_path_list, working
     :param file_path_list: Full file path for any manipulation
     :param working_dir: Working directory
     """
-    WORKSPACE_PREFIX = config.get("WORKSPACE", None)
+    issue_dict = normalize_issue(tool_name, issue, working_dir)
+    if not issue_dict:
+        return None
+    return create_result_from_dict(
+        tool_name, issue_dict, rules, rule_indices, working_dir
+    )
+
+
+def normalize_issue(tool_name, issue, working_dir):
+    """Method to normalise a single issue from the tool
+
+    :param tool_name: tool name
+    :param issue: Issue object or dict from the tool
+    :param working_dir: Working directory
+
+    :return issue_dict: Normalised finding or None if the issue is ignored
+    """
     if isinstance(issue, dict):
         issue = issue_from_dict(issue)
 
-    issue_dict = issue.as_dict()
+    issue_dict = issue.as_finding()
     rule_id = issue_dict.get("test_id")
     # Is this rule ignored globally?
     if rule_id in config.ignored_rules:
         return None
+    # Does this issue belong to an ignored file or directory?
+    if working_dir and is_ignored_file(working_dir, issue_dict["filename"]):
+        return None
+    # Fix up severity for certain tools
+    issue_dict["issue_severity"] = tweak_severity(tool_name, issue_dict)
+    return issue_dict
+
+
+class PathRewriter(object):
+    """
+    Rewrites the file names reported by the tools into the uri used in the
+    log. The workspace prefix gets substituted for the working directory. The
+    uri for every distinct file name is computed only once
+    """
+
+    def __init__(self, working_dir, workspace_prefix=None):
+        """
+        :param working_dir: Working directory
+        :param workspace_prefix: Workspace prefix. Eg: https://github.com/ShiftLeftSecurity/sast-scan/blob/master
+        """
+        self.working_dir = working_dir
+        self.workspace_prefix = workspace_prefix
+        self.uris = {}
+
+    @classmethod
+    def from_config(cls, working_dir):
+        return cls(working_dir, config.get("WORKSPACE", None))
+
+    def rewrite(self, filename):
+        """
+        Method to substitute the workspace prefix
+
+        :param filename: File name reported by the tool
+        :return: File name to use in the log
+        """
+        working_dir = self.working_dir
+        workspace_prefix = self.workspace_prefix
+        if not working_dir:
+            return filename
+        # Issue 5 fix. Convert relative to full path automatically
+        # Convert to full path only if the user wants
+        if workspace_prefix is None:
+            if not filename.startswith(working_dir):
+                filename = os.path.join(working_dir, filename)
+            return filename
+        # Make it relative path
+        if workspace_prefix == "":
+            if filename.startswith(working_dir + "/"):
+                filename = filename[len(working_dir) + 1 :]
+        elif not filename.startswith(working_dir):
+            filename = os.path.join(workspace_prefix, filename)
+        else:
+            filename = workspace_prefix + filename[len(working_dir) :]
+        return filename
+
+    def to_uri(self, filename):
+        """
+        Method to construct the uri for the file name reported by the tool
+
+        :param filename: File name reported by the tool
+        :return: uri
+        """
+        uri = self.uris.get(filename)
+        if uri is None:
+            uri = to_uri(self.rewrite(filename))
+            self.uris[filename] = uri
+        return uri
+
+
+def create_result_from_dict(
+    tool_name,
+    issue_dict,
+    rules,
+    rule_indices,
+    working_dir,
+    path_rewriter=None,
+    fingerprint=None,
+):
+    """Method to convert a normalised issue into result schema with rules
+
+    :param tool_name: tool name
+    :param issue_dict: Normalised finding
+    :param rules: List of rules
+    :param rule_indices: Indices of referred rules
+    :param working_dir: Working directory
+    :param path_rewriter: PathRewriter to reuse across the results
+    :param fingerprint: Partial fingerprints when computed for a batch of results
+    """
+    if not path_rewriter:
+        path_rewriter = PathRewriter.from_config(working_dir)
     rule, rule_index = create_or_find_rule(tool_name, issue_dict, rules, rule_indices)
 
     # Substitute workspace prefix
     # Override file path prefix with workspace
-    filename = issue_dict["filename"]
-    if working_dir:
-        # Issue 5 fix. Convert relative to full path automatically
-        # Convert to full path only if the user wants
-        if WORKSPACE_PREFIX is None and not filename.startswith(working_dir):
-            filename = os.path.join(working_dir, filename)
-        if WORKSPACE_PREFIX is not None:
-            # Make it relative path
-            if WORKSPACE_PREFIX == "":
-                filename = re.sub(r"^" + working_dir + "/", WORKSPACE_PREFIX, filename)
-            elif not filename.startswith(working_dir):
-                filename = os.path.join(WORKSPACE_PREFIX, filename)
-            else:
-                filename = re.sub(r"^" + working_dir, WORKSPACE_PREFIX, filename)
-    physical_location = om.PhysicalLocation(
-        artifact_location=om.ArtifactLocation(uri=to_uri(filename))
-    )
+    physical_location = {
+        "artifactLocation": {"uri": path_rewriter.to_uri(issue_dict["filename"])},
+    }
 
     add_region_and_context_region(
         physical_location, issue_dict["line_number"], issue_dict["code"]
     )
-    issue_severity = tweak_severity(tool_name, issue_dict)
-    fingerprint = {}
-    """
-    if physical_location.region and physical_location.region.snippet.text:
-        snippet = physical_location.region.snippet.text
-        snippet = snippet.strip().replace("\t", "").replace("\n", "")
-        h = blake2b(digest_size=HASH_DIGEST_SIZE)
-        h.update(snippet.encode())
-        fingerprint = {"primaryLocationLineHash": h.hexdigest() + ":1"}
-    """
-    return om.Result(
-        rule_id=rule.id,
-        rule_index=rule_index,
-        message=om.Message(
-            text=issue_dict["issue_text"],
-            markdown=issue_dict["issue_text"] if tool_name == "inspect" else "",
-        ),
-        level=level_from_severity(issue_severity),
-        locations=[om.Location(physical_location=physical_location)],
-        partial_fingerprints=fingerprint,
-        properties={
-            "issue_confidence": issue_dict["issue_confidence"],
-            "issue_severity": issue_severity,
+    issue_severity = issue_dict["issue_severity"]
+    if fingerprint is None:
+        fingerprint = get_fingerprint(issue_dict, working_dir)
+    level = level_from_severity(issue_severity)
+    return sarif_writer.omit_none(
+        {
+            "message": sarif_writer.omit_none(
+                {
+                    "markdown": (
+                        issue_dict["issue_text"] if tool_name == "inspect" else ""
+                    ),
+                    "text": issue_dict["issue_text"],
+                }
+            ),
+            # warning is the default level
+            "level": level if level != "warning" else None,
+            "locations": [{"physicalLocation": physical_location}],
+            "properties": {
+                "issue_confidence": issue_dict["issue_confidence"],
+                "issue_severity": issue_severity,
+            },
+            "baselineState": "unchanged" if issue_dict["first_found"] else "new",
+            "partialFingerprints": fingerprint,
+            "ruleId": rule["id"],
+            "ruleIndex": rule_index,
         },
-        baseline_state="unchanged" if issue_dict["first_found"] else "new",
+        keep=("message",),
     )
 
 
+def get_fingerprints(filename, line_numbers, working_dir):
+    """Method to compute the line hashes for a batch of lines in a file. The
+    line hash ignores the line number so that it survives line shifts
+
+    :param filename: File name of the findings
+    :param line_numbers: List of line numbers
+    :param working_dir: Working directory
+    :return: Dict of line number to line hash. Empty if the source file is not available
+    """
+    line_numbers = [line for line in line_numbers if line]
+    if not filename or not line_numbers:
+        return {}
+    # Use the relative path so that the hash does not depend on the checkout location
+    file_name = filename
+    if working_dir and filename.startswith(working_dir):
+        file_name = filename[len(working_dir) :].lstrip("/")
+    return snippets.get_fingerprints(filename, file_name, line_numbers)
+
+
+def get_fingerprint_dict(fingerprints, line_number):
+    if not line_number or line_number not in fingerprints:
+        return {}
+    return {"primaryLocationLineHash": fingerprints[line_number]}
+
+
+def get_fingerprint(issue_dict, working_dir):
+    """Method to compute the partial fingerprints for the result
+
+    :param issue_dict: Normalised finding
+    :param working_dir: Working directory
+    :return: Dict with primaryLocationLineHash or an empty dict if the source
+    file is not available
+    """
+    line_number = issue_dict["line_number"]
+    fingerprints = get_fingerprints(issue_dict["filename"], [line_number], working_dir)
+    return get_fingerprint_dict(fingerprints, line_number)
+
+
 def level_from_severity(severity):
     """Converts tool's severity to the 4 level
         suggested by SARIF
@@ -460,14 +617,15 @@ def level_from_severity(severity):
         return "warning"
 
 
-def add_region_and_context_region(physical_location, line_number, code):
+def add_region_and_context_region(physical_location, line_number, code_lines):
     """This adds the region information for displaying the code snippet
 
     :param physical_location: Points to file
     :param line_number: Line number suggested by the tool
-    :param code: Source code snippet
+    :param code_lines: Source code snippet as a list of (lineno, text) tuples
     """
-    first_line_number, snippet_lines = parse_code(code)
+    first_line_number = code_lines[0][0] if code_lines else 1
+    snippet_lines = [text for _, text in code_lines]
     end_line_number = first_line_number + len(snippet_lines) - 1
     if end_line_number < first_line_number:
         end_line_number = first_line_number + 3
@@ -480,50 +638,21 @@ def add_region_and_context_region(physical_location, line_number, code):
             snippet_line = snippet_lines[0]
     if snippet_line.strip().replace("\n", "") == "":
         snippet_line = ""
-    physical_location.region = om.Region(
-        start_line=line_number, snippet=om.ArtifactContent(text=snippet_line)
+    # Same property order as the SARIF object model
+    artifact_location = physical_location.pop("artifactLocation")
+    physical_location["region"] = sarif_writer.omit_none(
+        {"snippet": {"text": snippet_line}, "startLine": line_number}
     )
-
-    physical_location.context_region = om.Region(
-        start_line=first_line_number,
-        end_line=end_line_number,
-        snippet=om.ArtifactContent(text="".join(snippet_lines)),
+    physical_location["artifactLocation"] = artifact_location
+    physical_location["contextRegion"] = sarif_writer.omit_none(
+        {
+            "snippet": {"text": "".join(snippet_lines)},
+            "endLine": end_line_number,
+            "startLine": first_line_number,
+        }
     )
 
 
-def parse_code(code):
-    """Method to parse the code to extract line number and snippets
-    """
-    code_lines = code.split("\n")
-
-    # The last line from the split has nothing in it; it's an artifact of the
-    # last "real" line ending in a newline. Unless, of course, it doesn't:
-    last_line = code_lines[len(code_lines) - 1]
-
-    last_real_line_ends_in_newline = False
-    if len(last_line) == 0:
-        code_lines.pop()
-        last_real_line_ends_in_newline = True
-
-    snippet_lines = []
-    first = True
-    first_line_number = 1
-    for code_line in code_lines:
-        number_and_snippet_line = code_line.split(" ", 1)
-        if first:
-            first_line_number = int(number_and_snippet_line[0])
-            first = False
-        if len(number_and_snippet_line) > 1:
-            snippet_line = number_and_snippet_line[1] + "\n"
-            snippet_lines.append(snippet_line)
-
-    if not last_real_line_ends_in_newline:
-        last_line = snippet_lines[len(snippet_lines) - 1]
-        snippet_lines[len(snippet_lines) - 1] = last_line[: len(last_line) - 1]
-
-    return first_line_number, snippet_lines
-
-
 def get_rule_short_description(tool_name, rule_id, test_name, issue_dict):
     """
     Constructs a short description for the rule
@@ -540,6 +669,9 @@ def get_rule_short_description(tool_name, rule_id, test_name, issue_dict):
         if not test_name.endswith("."):
             test_name = test_name + "."
         return test_name
+    rule_meta = get_rule_metadata(tool_name, rule_id)
+    if rule_meta.get("shortDescription"):
+        return rule_meta["shortDescription"]
     return "Rule {} from {}.".format(rule_id, tool_name)
 
 
@@ -594,11 +726,89 @@ def get_url(tool_name, rule_id, test_name, issue_dict):
         return "https://cwe.mitre.org/data/definitions/%s.html" % rule_id.replace(
             "CWE-", ""
         )
+    rule_meta = get_rule_metadata(tool_name, rule_id)
+    if rule_meta.get("helpUri"):
+        return rule_meta["helpUri"]
     return "https://stackoverflow.com/search?q=shiftleft/sast-scan+{}+{}+{}".format(
         tool_name, rule_id, test_name
     )
 
 
+def get_rule_metadata(tool_name, rule_id):
+    """Method to retrieve the prebuilt metadata for a well known rule of a tool
+    that does not report the rule names such as gosec. The pack is optional and
+    loaded on first use
+
+    :param tool_name: tool name
+    :param rule_id: Rule id
+    :return: Dict with the name, shortDescription and helpUri if known
+    """
+    global rules_pack
+    if rules_pack is None:
+        pack = {}
+        try:
+            with open(rules_pack_file, mode="r") as fp:
+                pack = json.load(fp)
+        except (OSError, ValueError) as e:
+            LOG.debug(e)
+        rules_pack = pack
+    if not rule_id:
+        return {}
+    return rules_pack.get(tool_name, {}).get(rule_id.upper(), {})
+
+
+@functools.lru_cache(maxsize=4096)
+def get_rule_descriptor(
+    tool_name, rule_id, test_name, issue_text, test_ref_url, issue_severity
+):
+    """Method to build the rule descriptor. The descriptor depends only on the
+    arguments so it is shared by every report in this process and must not be
+    modified by the callers
+
+    :param tool_name: tool name
+    :param rule_id: Rule id
+    :param test_name: Test name reported by the tool
+    :param issue_text: Issue text
+    :param test_ref_url: Reference url reported by the tool
+    :param issue_severity: Issue severity
+
+    :return: Rule dict
+    """
+    issue_dict = {"issue_text": issue_text, "test_ref_url": test_ref_url}
+    precision = "high"
+    if rule_id and rule_id.upper().startswith("CWE") or tool_name == "inspect":
+        precision = "very-high"
+    # The help is the same for text and markdown
+    help_text = get_help("text", tool_name, rule_id, test_name, issue_dict)
+    name = test_name
+    if not name:
+        name = get_rule_metadata(tool_name, rule_id).get("name", name)
+    return sarif_writer.omit_none(
+        {
+            "id": rule_id,
+            "help": {"text": help_text, "markdown": help_text},
+            "name": name,
+            "properties": {
+                "tags": ["ShiftLeft", "Inspect" if tool_name == "inspect" else "Scan"],
+                "precision": precision,
+            },
+            "defaultConfiguration": {"level": level_from_severity(issue_severity)},
+            "fullDescription": {
+                "text": get_rule_full_description(
+                    tool_name, rule_id, test_name, issue_dict
+                )
+            },
+            "helpUri": get_url(tool_name, rule_id, test_name, issue_dict),
+            "shortDescription": {
+                "text": get_rule_short_description(
+                    tool_name, rule_id, test_name, issue_dict
+                )
+            },
+        },
+        keep=("id",),
+    )
+
+
 def create_or_find_rule(tool_name, issue_dict, rules, rule_indices):
     """Creates rules object for the rules section. Different tools make up
         their own id and names so this is identified on the fly
@@ -613,39 +823,14 @@ def create_or_find_rule(tool_name, issue_dict, rules, rule_indices):
     rule_id = issue_dict["test_id"]
     if rule_id in rules:
         return rules[rule_id], rule_indices[rule_id]
-    precision = "high"
-    if rule_id and rule_id.upper().startswith("CWE") or tool_name == "inspect":
-        precision = "very-high"
-    issue_severity = tweak_severity(tool_name, issue_dict)
-    rule = om.ReportingDescriptor(
-        id=rule_id,
-        name=issue_dict["test_name"],
-        short_description={
-            "text": get_rule_short_description(
-                tool_name, rule_id, issue_dict["test_name"], issue_dict
-            )
-        },
-        full_description={
-            "text": get_rule_full_description(
-                tool_name, rule_id, issue_dict["test_name"], issue_dict
-            )
-        },
-        help={
-            "text": get_help(
-                "text", tool_name, rule_id, issue_dict["test_name"], issue_dict
-            ),
-            "markdown": get_help(
-                "markdown", tool_name, rule_id, issue_dict["test_name"], issue_dict
-            ),
-        },
-        help_uri=get_url(tool_name, rule_id, issue_dict["test_name"], issue_dict),
-        properties={
-            "tags": ["ShiftLeft", "Inspect" if tool_name == "inspect" else "Scan"],
-            "precision": precision,
-        },
-        default_configuration={"level": level_from_severity(issue_severity)},
+    rule = get_rule_descriptor(
+        tool_name,
+        rule_id,
+        issue_dict["test_name"],
+        issue_dict.get("issue_text", ""),
+        issue_dict.get("test_ref_url"),
+        tweak_severity(tool_name, issue_dict),
     )
-
     index = len(rules)
     rules[rule_id] = rule
     rule_indices[rule_id] = index
@@ -659,6 +844,19 @@ def to_uri(file_path):
     """
     if file_path.startswith("http"):
         return file_path
+    # Fast path for the common case of a normalised posix path
+    if (
+        "\\" not in file_path
+        and "//" not in file_path
+        and "/./" not in file_path
+        and not file_path.startswith("./")
+        and not file_path.endswith("/")
+        and not file_path.endswith("/.")
+        and file_path not in ("", ".")
+    ):
+        if file_path.startswith("/"):
+            return "file://" + urllib.parse.quote(file_path)
+        return file_path
     if "\\" in file_path:
         if "/" in file_path:
             file_path = file_path.replace("/", "\\")
@@ -1,20 +1,71 @@
 import csv
+import json
+import threading
 from pathlib import Path
 
 cwe_software_csv = Path(__file__).parent / "data" / "cwe_software.csv"
 cwe_research_csv = Path(__file__).parent / "data" / "cwe_research.csv"
 
-cwe_dict = {}
+# Compact index with just the columns used by scan. Regenerate with
+# python -m lib.cwe whenever the csv files are updated
+cwe_index_file = Path(__file__).parent / "data" / "cwe-index.json"
 
-if not cwe_dict:
-    with open(cwe_software_csv, newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            cwe_dict[row["CWE-ID"]] = row
-    with open(cwe_research_csv, newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            cwe_dict[row["CWE-ID"]] = row
+INDEX_COLUMNS = ["Name", "Description", "Extended Description", "Related Weaknesses"]
+
+cwe_index = None
+
+index_lock = threading.Lock()
+
+
+def read_csv_index():
+    """
+    Method to build the compact index from the csv files
+
+    :return: dict of cwe id to the list of column values
+    """
+    index = {}
+    for csv_file in (cwe_software_csv, cwe_research_csv):
+        with open(csv_file, newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                index[row["CWE-ID"]] = [row[col] for col in INDEX_COLUMNS]
+    return index
+
+
+def build_index(index_file=cwe_index_file):
+    """
+    Method to write the compact index file
+
+    :param index_file: Index file to write
+    """
+    index = read_csv_index()
+    with open(index_file, mode="w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_index():
+    """
+    Method to load the index on first use. The csv files are parsed only
+    when the compact index is not available
+
+    :return: dict of cwe id to the list of column values
+    """
+    global cwe_index
+    with index_lock:
+        if cwe_index is None:
+            try:
+                with open(cwe_index_file) as f:
+                    cwe_index = json.load(f)
+            except (OSError, ValueError):
+                cwe_index = read_csv_index()
+    return cwe_index
+
+
+def to_row(cid, values):
+    row = dict(zip(INDEX_COLUMNS, values))
+    row["CWE-ID"] = cid
+    return row
 
 
 def get_all():
@@ -22,7 +73,7 @@ def get_all():
     Return data about all CWE
     :return: dict containing all CWE data
     """
-    return cwe_dict
+    return {cid: to_row(cid, values) for cid, values in load_index().items()}
 
 
 def get(cid):
@@ -32,7 +83,10 @@ def get(cid):
     :return: CWE data
     """
     cid = cid.upper().replace("CWE-", "")
-    return cwe_dict.get(cid)
+    values = load_index().get(cid)
+    if values is None:
+        return None
+    return to_row(cid, values)
 
 
 def get_name(cid):
@@ -72,3 +126,7 @@ def get_description(cid, extended=False):
     if not desc.endswith("."):
         desc = desc + "."
     return desc
+
+
+if __name__ == "__main__":
+    build_index()
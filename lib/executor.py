@@ -16,16 +16,26 @@
 import io
 import os
 import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import reporter.grafeas as grafeas
 import reporter.licence as licence
 
 import lib.config as config
-import lib.convert as convertLib
+import lib.pipeline as pipeline
+import lib.pmd as pmd
 import lib.utils as utils
 from lib.logger import LOG
 from lib.telemetry import track
 
+# Commands executed in the current scan along with the report they produce.
+# Project types such as terraform and yaml share the same checkov command
+executed_cmds = set()
+
+executed_cmds_lock = threading.Lock()
+
 
 def use_java(env):
     """
@@ -56,7 +66,8 @@ def exec_tool(args, cwd=None, env=os.environ.copy(), stdout=subprocess.DEVNULL):
       CompletedProcess instance
     """
     try:
-        env = use_java(env)
+        # Work on a copy since the default env is shared between concurrent tools
+        env = use_java(env.copy())
         LOG.info("=" * 80)
         LOG.debug('⚡︎ Executing "{}"'.format(" ".join(args)))
         cp = subprocess.run(
@@ -75,6 +86,67 @@ def exec_tool(args, cwd=None, env=os.environ.copy(), stdout=subprocess.DEVNULL):
         return None
 
 
+def run_tasks(tasks, jobs=1):
+    """
+    Method to run the given tasks using a pool of worker threads. Tasks sharing
+    the same key write to the same reports and are therefore run one after the
+    other in the given order. Tasks with different keys run concurrently
+
+    Args:
+      tasks List of tuples in the form (key, function, args)
+      jobs Maximum number of tasks to run at the same time
+
+    Returns:
+      List of return values in the same order as the tasks
+    """
+    groups = OrderedDict()
+    for idx, (key, func, args) in enumerate(tasks):
+        groups.setdefault(key, []).append((idx, func, args))
+
+    def run_group(group):
+        return [(idx, func(*args)) for idx, func, args in group]
+
+    results = [None] * len(tasks)
+    if not jobs or jobs < 2 or len(groups) < 2:
+        for group in groups.values():
+            for idx, ret in run_group(group):
+                results[idx] = ret
+        return results
+    with ThreadPoolExecutor(max_workers=min(jobs, len(groups))) as pool:
+        futures = [pool.submit(run_group, group) for group in groups.values()]
+        for future in futures:
+            for idx, ret in future.result():
+                results[idx] = ret
+    return results
+
+
+def reset_executed_cmds():
+    """
+    Method to forget the commands executed so far. Invoked at the start of a scan
+    """
+    with executed_cmds_lock:
+        executed_cmds.clear()
+
+
+def claim_cmd(default_cmd, report_fname):
+    """
+    Method to register a command before it is executed
+
+    Args:
+      default_cmd Command with all the arguments expanded
+      report_fname Report file produced by the command
+
+    Returns:
+      True if the command was not executed before in this scan
+    """
+    key = (default_cmd, report_fname)
+    with executed_cmds_lock:
+        if key in executed_cmds:
+            return False
+        executed_cmds.add(key)
+        return True
+
+
 def execute_default_cmd(
     cmd_map_list,
     type_str,
@@ -106,7 +178,8 @@ def execute_default_cmd(
     if config.get(tool_name + "_direct_args"):
         direct_args = config.get(tool_name + "_direct_args").split(" ")
         if direct_args:
-            cmd_map_list += direct_args
+            # Do not modify the command list from the config
+            cmd_map_list = cmd_map_list + direct_args
     default_cmd = " ".join(cmd_map_list) % dict(
         src=src,
         reports_dir=reports_dir,
@@ -114,15 +187,13 @@ def execute_default_cmd(
         type=type_str,
         scan_mode=scan_mode,
     )
-    # Try to detect if the output could be json
-    outext = ".out"
-    if default_cmd.find("json") > -1:
-        outext = ".json"
-    if default_cmd.find("csv") > -1:
-        outext = ".csv"
-    if default_cmd.find("sarif") > -1:
-        outext = ".sarif"
+    outext = get_report_ext(default_cmd)
     report_fname = report_fname_prefix + outext
+    # The same command producing the same report is executed only once per scan
+    # and the report is shared by all the project types requesting it
+    if not claim_cmd(default_cmd, report_fname):
+        LOG.debug("Skipping the repeated command {}".format(default_cmd))
+        return
 
     # If the command doesn't support file output then redirect stdout automatically
     stdout = None
@@ -131,19 +202,12 @@ def execute_default_cmd(
         stdout = io.open(report_fname, "w")
         LOG.debug("Output will be written to {}".format(report_fname))
 
-    # If the command is requesting list of files then construct the argument
-    filelist_prefix = "(filelist="
-    if default_cmd.find(filelist_prefix) > -1:
-        si = default_cmd.find(filelist_prefix)
-        ei = default_cmd.find(")", si + 10)
-        ext = default_cmd[si + 10 : ei]
-        filelist = utils.find_files(src, ext)
-        delim = " "
-        default_cmd = default_cmd.replace(
-            filelist_prefix + ext + ")", delim.join(filelist)
-        )
-    cmd_with_args = default_cmd.split(" ")
+    cmd_with_args = expand_filelist(default_cmd, src).split(" ")
+    if pmd.is_pmd_cmd(cmd_with_args):
+        cmd_with_args = pmd.use_incremental_cache(cmd_with_args, src, tool_name)
     exec_tool(cmd_with_args, cwd=src, stdout=stdout)
+    if stdout:
+        stdout.close()
     # Should we attempt to convert the report to sarif format
     if (
         convert
@@ -153,43 +217,93 @@ def execute_default_cmd(
         crep_fname = utils.get_report_file(
             tool_name, reports_dir, convert, ext_name="sarif"
         )
-        convertLib.convert_file(
-            cmd_with_args[0], cmd_with_args[1:], src, report_fname, crep_fname,
+        pipeline.convert_file(
+            cmd_with_args[0],
+            cmd_with_args[1:],
+            src,
+            report_fname,
+            crep_fname,
+            remove_report=True,
         )
-        try:
-            if not os.environ.get("SCAN_DEBUG_MODE") == "debug":
-                os.remove(report_fname)
-        except Exception:
-            LOG.debug("Unable to remove file {}".format(report_fname))
     elif type_str == "depscan":
-        # Convert depscan and license scan files to html
-        depscan_files = utils.find_files(reports_dir, "depscan", True)
-        for df in depscan_files:
-            if not df.endswith(".html"):
-                depscan_data = grafeas.parse(df)
-                if depscan_data and len(depscan_data):
-                    html_fname = df.replace(".json", ".html")
-                    grafeas.render_html(depscan_data, html_fname)
-                    track(
-                        {"id": config.get("run_uuid"), "depscan_summary": depscan_data}
-                    )
-                    LOG.debug(
-                        "Depscan and HTML report written to file: %s, %s 👍",
-                        df,
-                        html_fname,
-                    )
-        licence_files = utils.find_files(reports_dir, "license", True)
-        for lf in licence_files:
-            if not lf.endswith(".html"):
-                licence_data = licence.parse(lf)
-                if licence_data and len(licence_data):
-                    html_fname = lf.replace(".json", ".html")
-                    licence.render_html(licence_data, html_fname)
-                    track(
-                        {"id": config.get("run_uuid"), "license_summary": licence_data}
-                    )
-                    LOG.debug(
-                        "License check and HTML report written to file: %s, %s 👍",
-                        lf,
-                        html_fname,
-                    )
+        convert_depscan_reports(reports_dir)
+
+
+def get_report_ext(default_cmd):
+    """
+    Method to detect the extension of the report produced by the command
+
+    Args:
+      default_cmd Command with all the arguments expanded
+
+    Returns:
+      Extension such as .json. Defaults to .out
+    """
+    outext = ".out"
+    if default_cmd.find("json") > -1:
+        outext = ".json"
+    if default_cmd.find("csv") > -1:
+        outext = ".csv"
+    if default_cmd.find("sarif") > -1:
+        outext = ".sarif"
+    return outext
+
+
+def expand_filelist(default_cmd, src):
+    """
+    Method to construct the argument for commands requesting a list of files
+    with (filelist=ext)
+
+    Args:
+      default_cmd Command with all the arguments expanded
+      src Project dir
+
+    Returns:
+      Command with the list of files
+    """
+    filelist_prefix = "(filelist="
+    if default_cmd.find(filelist_prefix) > -1:
+        si = default_cmd.find(filelist_prefix)
+        ei = default_cmd.find(")", si + 10)
+        ext = default_cmd[si + 10 : ei]
+        filelist = utils.get_inventory(src).find_files(ext)
+        delim = " "
+        default_cmd = default_cmd.replace(
+            filelist_prefix + ext + ")", delim.join(filelist)
+        )
+    return default_cmd
+
+
+def convert_depscan_reports(reports_dir):
+    """
+    Method to convert depscan and license scan files to html
+
+    Args:
+      reports_dir Directory for output reports
+    """
+    depscan_files = utils.find_files(reports_dir, "depscan", True)
+    for df in depscan_files:
+        if not df.endswith(".html"):
+            depscan_data = grafeas.parse(df)
+            if depscan_data and len(depscan_data):
+                html_fname = df.replace(".json", ".html")
+                grafeas.render_html(depscan_data, html_fname)
+                track({"id": config.get("run_uuid"), "depscan_summary": depscan_data})
+                LOG.debug(
+                    "Depscan and HTML report written to file: %s, %s 👍",
+                    df,
+                    html_fname,
+                )
+    licence_files = utils.find_files(reports_dir, "license", True)
+    for lf in licence_files:
+        if not lf.endswith(".html"):
+            licence_data = licence.parse(lf)
+            if licence_data and len(licence_data):
+                html_fname = lf.replace(".json", ".html")
+                licence.render_html(licence_data, html_fname)
+                track({"id": config.get("run_uuid"), "license_summary": licence_data})
+                LOG.debug(
+                    "License check and HTML report written to file: %s, %s 👍",
+                    lf,
+                    html_fname,
+                )
@@ -0,0 +1,243 @@
+# This file is part of Scan.
+
+# Scan is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Scan is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Scan.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import threading
+
+import lib.config as config
+from lib.logger import LOG
+
+# Files in the source directory containing additional ignore patterns
+ignore_files = [".gitignore", ".sastscanignore"]
+
+# Ignore files applied to the results. Files listed in .gitignore can still be
+# committed, eg: a .env file with secrets, so their findings must be reported
+results_ignore_files = [".sastscanignore"]
+
+# Matchers built during this run keyed by the base directory
+matchers = {}
+
+# Matchers for the results keyed by the base directory
+results_matchers = {}
+
+matcher_lock = threading.Lock()
+
+
+def glob_to_regex(glob):
+    """
+    Method to translate a gitignore style glob into a regular expression
+
+    :param glob: Glob pattern without any leading or trailing slash
+    :return: Regular expression string
+    """
+    out = []
+    i = 0
+    n = len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith("**/", i) and (i == 0 or glob[i - 1] == "/"):
+            # Zero or more directories
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = glob.find("]", i + 2)
+            if j == -1:
+                out.append(re.escape(c))
+                i += 1
+                continue
+            chars = glob[i + 1 : j]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            out.append("[" + chars.replace("\\", "\\\\") + "]")
+            i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+def compile_pattern(pattern):
+    """
+    Method to compile a single gitignore style pattern
+
+    :param pattern: Pattern string
+    :return: Tuple of directory regex, file regex and a negate flag. None for
+    blank lines and comments
+    """
+    pattern = pattern.rstrip("\n").rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negate = False
+    if pattern.startswith("!"):
+        negate = True
+        pattern = pattern[1:]
+    elif pattern.startswith("\\"):
+        pattern = pattern[1:]
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # Patterns with a slash are relative to the base directory. The rest can
+    # match at any level
+    anchored = "/" in pattern or pattern.startswith("**")
+    pattern = pattern.lstrip("/")
+    if not pattern:
+        return None
+    if anchored:
+        prefix = "^"
+    else:
+        prefix = "(?:^|/)"
+    body = prefix + glob_to_regex(pattern)
+    # Matching a directory implies matching everything underneath it
+    dir_regex = body + "(?=/|$)"
+    file_regex = body + ("/" if dir_only else "(?=/|$)")
+    return dir_regex, file_regex, negate
+
+
+class IgnoreMatcher(object):
+    """
+    Matcher for gitignore style patterns compiled into a single regular
+    expression. Paths are matched relative to the base directory
+    """
+
+    def __init__(self, base_dir, patterns):
+        """
+        :param base_dir: Base directory
+        :param patterns: List of gitignore style patterns
+        """
+        self.base_dir = base_dir
+        self.prefix = base_dir.rstrip("/") + "/"
+        self.patterns = [p.rstrip("\n") for p in patterns]
+        compiled = [c for c in (compile_pattern(p) for p in patterns) if c]
+        self.has_negation = any(negate for _, _, negate in compiled)
+        if self.has_negation:
+            # Last matching pattern wins when patterns can re-include paths
+            self.rules = [
+                (re.compile(d).search, re.compile(f).search, negate)
+                for d, f, negate in reversed(compiled)
+            ]
+        else:
+            self.dir_search = self.compile_all([d for d, _, _ in compiled])
+            self.file_search = self.compile_all([f for _, f, _ in compiled])
+
+    @staticmethod
+    def compile_all(regex_list):
+        if not regex_list:
+            return lambda path: None
+        return re.compile("|".join("(?:" + r + ")" for r in regex_list)).search
+
+    @classmethod
+    def from_config(cls, base_dir, ignore_file_names=None):
+        """
+        Construct the matcher for the given base directory using the ignore
+        directories from the config or .sastscanrc along with any .gitignore
+        and .sastscanignore in the base directory
+
+        :param base_dir: Base directory
+        :param ignore_file_names: Ignore files to read. Defaults to ignore_files
+        :return: IgnoreMatcher instance
+        """
+        if ignore_file_names is None:
+            ignore_file_names = ignore_files
+        patterns = [d + "/" for d in config.get("ignore_directories", [])]
+        for fname in ignore_file_names:
+            ignore_file = os.path.join(base_dir, fname)
+            if os.path.isfile(ignore_file):
+                try:
+                    with open(ignore_file, mode="r", errors="ignore") as fp:
+                        patterns += fp.readlines()
+                except OSError as e:
+                    LOG.debug(e)
+        return cls(base_dir, patterns)
+
+    def relative_path(self, path):
+        """
+        Method to convert the path to be relative to the base directory
+
+        :param path: Full or relative path
+        :return: Relative path or None if the path is outside the base directory
+        """
+        if path.startswith(self.prefix):
+            return path[len(self.prefix) :]
+        if path == self.base_dir or path == self.base_dir.rstrip("/"):
+            return ""
+        if os.path.isabs(path):
+            return None
+        if path.startswith("./"):
+            path = path[2:]
+        return path
+
+    def is_ignored(self, path, is_dir=False):
+        """
+        Method to check if the given path is ignored
+
+        :param path: Full path or path relative to the base directory
+        :param is_dir: Boolean indicating if the path is a directory
+        :return: True if the path is ignored. False otherwise
+        """
+        rel_path = self.relative_path(path)
+        if not rel_path:
+            return False
+        if self.has_negation:
+            for dir_search, file_search, negate in self.rules:
+                search = dir_search if is_dir else file_search
+                if search(rel_path):
+                    return not negate
+            return False
+        search = self.dir_search if is_dir else self.file_search
+        return search(rel_path) is not None
+
+
+def get_matcher(base_dir):
+    """
+    Method to retrieve the ignore matcher for the given base directory. The
+    matcher is built once and shared for the rest of the run
+
+    :param base_dir: Base directory
+    :return: IgnoreMatcher instance
+    """
+    with matcher_lock:
+        matcher = matchers.get(base_dir)
+        if matcher is None:
+            matcher = IgnoreMatcher.from_config(base_dir)
+            matchers[base_dir] = matcher
+        return matcher
+
+
+def get_results_matcher(base_dir):
+    """
+    Method to retrieve the matcher used to filter the results for the given
+    base directory. Unlike get_matcher the .gitignore patterns are not used
+
+    :param base_dir: Base directory
+    :return: IgnoreMatcher instance
+    """
+    with matcher_lock:
+        matcher = results_matchers.get(base_dir)
+        if matcher is None:
+            matcher = IgnoreMatcher.from_config(base_dir, results_ignore_files)
+            results_matchers[base_dir] = matcher
+        return matcher
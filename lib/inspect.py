@@ -18,7 +18,7 @@ import os
 import requests
 
 import lib.config as config
-import lib.convert as convertLib
+import lib.pipeline as pipeline
 import lib.utils as utils
 from lib.executor import exec_tool
 from lib.logger import LOG
@@ -251,7 +251,7 @@ def inspect_scan(language, src, reports_dir, convert, repo_context):
         crep_fname = utils.get_report_file(
             "inspect", reports_dir, convert, ext_name="sarif"
         )
-        convertLib.convert_file("inspect", sl_args[1:], src, report_fname, crep_fname)
+        pipeline.convert_file("inspect", sl_args[1:], src, report_fname, crep_fname)
     track({"id": run_uuid, "scan_mode": "inspect", "sl_args": sl_args})
 
 
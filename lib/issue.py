@@ -15,16 +15,138 @@
 
 # Adapted from bandit/core
 
-import linecache
-
-from six import moves
+import sys
 
 import lib.config as config
 import lib.constants as constants
-from lib.logger import LOG
+from lib.snippet import snippets
+
+
+def parse_code_lines(code):
+    """Method to parse a code snippet in the "lineno text" format reported by
+    some tools
+
+    :param code: Code snippet
+    :return: List of (lineno, text) tuples
+    """
+    code_lines = code.split("\n")
+
+    # The last line from the split has nothing in it; it's an artifact of the
+    # last "real" line ending in a newline. Unless, of course, it doesn't:
+    last_real_line_ends_in_newline = False
+    if len(code_lines[-1]) == 0:
+        code_lines.pop()
+        last_real_line_ends_in_newline = True
+
+    lines = []
+    lineno = 0
+    for code_line in code_lines:
+        number_and_snippet_line = code_line.split(" ", 1)
+        if number_and_snippet_line[0].isdigit():
+            lineno = int(number_and_snippet_line[0])
+        else:
+            lineno += 1
+        if len(number_and_snippet_line) > 1:
+            lines.append((lineno, number_and_snippet_line[1] + "\n"))
+
+    if lines and not last_real_line_ends_in_newline:
+        lineno, text = lines[-1]
+        lines[-1] = (lineno, text[:-1])
+
+    return lines
+
+
+def intern_str(value):
+    """Intern repeated strings such as file names, rule ids and severities so
+    that the findings of large runs share a single copy"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class Finding(object):
+    """Compact record for a normalised issue. Supports read access by key so
+    that it can be used in place of the dict returned by Issue.as_dict"""
+
+    __slots__ = (
+        "filename",
+        "test_name",
+        "test_id",
+        "test_ref_url",
+        "issue_severity",
+        "issue_confidence",
+        "issue_text",
+        "line_number",
+        "line_range",
+        "first_found",
+        "code",
+    )
+
+    def __init__(
+        self,
+        filename,
+        test_name,
+        test_id,
+        test_ref_url,
+        issue_severity,
+        issue_confidence,
+        issue_text,
+        line_number,
+        line_range,
+        first_found,
+        code=None,
+    ):
+        self.filename = intern_str(filename)
+        self.test_name = intern_str(test_name)
+        self.test_id = intern_str(test_id)
+        self.test_ref_url = test_ref_url
+        self.issue_severity = intern_str(issue_severity)
+        self.issue_confidence = intern_str(issue_confidence)
+        self.issue_text = issue_text
+        self.line_number = line_number
+        self.line_range = line_range
+        self.first_found = first_found
+        self.code = code
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in ("filename", "test_id", "issue_severity"):
+            value = intern_str(value)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
 
 
 class Issue(object):
+    __slots__ = (
+        "severity",
+        "confidence",
+        "text",
+        "code",
+        "ident",
+        "fname",
+        "test",
+        "test_id",
+        "test_ref_url",
+        "lineno",
+        "linerange",
+        "snippet_based",
+        "line_hash",
+        "first_found",
+    )
+
     def __init__(
         self,
         severity=constants.SEVERITY_DEFAULT,
@@ -107,33 +229,21 @@ class Issue(object):
             self.confidence
         ) >= rank.index(confidence)
 
-    def get_code(self, max_lines=3, tabbed=False):
+    def get_code_lines(self, max_lines=3):
         """Gets lines of code from a file the generated this issue.
 
         :param max_lines: Max lines of context to return
-        :param tabbed: Use tabbing in the output
-        :return: strings of code
+        :return: List of (lineno, text) tuples
         """
         if not self.fname:
-            return ""
-        lines = []
+            return []
         max_lines = max(max_lines, 1)
         if not self.snippet_based:
             lmin = max(1, self.lineno - max_lines // 2)
             lmax = lmin + len(self.linerange) + max_lines - 1
-
-            tmplt = "%i\t%s" if tabbed else "%i %s"
-            for line in moves.xrange(lmin, lmax):
-                text = linecache.getline(self.fname, line)
-
-                if isinstance(text, bytes):
-                    text = text.decode("utf-8")
-
-                if not len(text):
-                    break
-                lines.append(tmplt % (line, text))
+            lines = snippets.get_lines(self.fname, lmin, lmax)
             if lines:
-                return "".join(lines)
+                return lines
             elif self.code:
                 # Validate if the code snippet is in the right format
                 orig_lines = self.code.split("\n")
@@ -141,29 +251,31 @@ class Issue(object):
                     orig_first_line = orig_lines[0]
                     firstword = orig_first_line.split(" ", 1)[0]
                     if firstword and str(firstword).isdigit():
-                        return self.code
-                return ""
+                        return parse_code_lines(self.code)
+                return []
             else:
-                return ""
+                return []
         else:
-            lineno = self.lineno
-            try:
-                tmplineno = 1
-                with open(self.fname, mode="r") as fp:
-                    for aline in fp:
-                        if aline.strip() == self.code.strip():
-                            lineno = tmplineno
-                            # Fix the line number
-                            self.lineno = lineno
-                            break
-                        tmplineno = tmplineno + 1
-            except Exception as e:
-                LOG.debug(e)
-            tmplt = "%i\t%s" if tabbed else "%i %s"
-            return tmplt % (lineno, self.code)
+            # Fix the line number
+            lineno = snippets.find_line(self.fname, self.code)
+            if lineno:
+                self.lineno = lineno
+            else:
+                lineno = self.lineno
+            return [(lineno, self.code)]
 
-    def as_dict(self, with_code=True):
-        """Convert the issue to a dict of values for outputting."""
+    def get_code(self, max_lines=3, tabbed=False):
+        """Gets lines of code from a file the generated this issue.
+
+        :param max_lines: Max lines of context to return
+        :param tabbed: Use tabbing in the output
+        :return: strings of code
+        """
+        tmplt = "%i\t%s" if tabbed else "%i %s"
+        return "".join(tmplt % line for line in self.get_code_lines(max_lines))
+
+    def as_finding(self, with_code=True):
+        """Convert the issue to a compact finding record for outputting."""
         issue_text = self.text.encode("utf-8").decode("utf-8")
         # As per the spec text sentence should end with a period
         if not issue_text.endswith("."):
@@ -173,25 +285,34 @@ class Issue(object):
             if override_sev:
                 self.severity = override_sev
 
-        out = {
-            "filename": self.fname,
-            "test_name": self.test,
-            "test_id": str(self.test_id),
-            "test_ref_url": self.test_ref_url,
-            "issue_severity": self.severity,
-            "issue_confidence": self.confidence,
-            "issue_text": issue_text,
-            "line_number": self.lineno,
-            "line_range": self.linerange,
-            "first_found": self.first_found,
-        }
+        finding = Finding(
+            self.fname,
+            self.test,
+            str(self.test_id),
+            self.test_ref_url,
+            self.severity,
+            self.confidence,
+            issue_text,
+            self.lineno,
+            self.linerange,
+            self.first_found,
+        )
 
         if with_code:
-            out["code"] = self.get_code()
+            finding.code = self.get_code_lines()
             # If the line number has changed since referring to the file
             # use the latest line number
-            if self.lineno != out["line_number"]:
-                out["line_number"] = self.lineno
+            if self.lineno != finding.line_number:
+                finding.line_number = self.lineno
+        return finding
+
+    def as_dict(self, with_code=True):
+        """Convert the issue to a dict of values for outputting."""
+        out = self.as_finding(with_code).as_dict()
+        if with_code:
+            out["code"] = "".join("%i %s" % line for line in out["code"])
+        else:
+            del out["code"]
         return out
 
     def norm_severity(self, severity):
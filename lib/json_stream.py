@@ -0,0 +1,275 @@
+# This file is part of Scan.
+
+# Scan is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Scan is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Scan.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Incremental reader for large json reports. Only the values that are asked for
+get decoded so the memory usage is bounded by the largest single value rather
+than the size of the report
+"""
+
+import json
+import re
+
+# Characters that matter when skipping over a value
+STRUCT_CHARS = re.compile(r'[\[\]{}"]')
+
+# Characters that end a string or start an escape sequence
+STRING_CHARS = re.compile(r'["\\]')
+
+# Characters that end a scalar value such as a number or true/false/null
+SCALAR_END = re.compile(r"[,\]}\s]")
+
+WHITESPACE = re.compile(r"\s*")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class JSONStream(object):
+    """
+    Pull parser over a json document. Containers are walked using iter_array
+    and iter_object while the values of interest are decoded with read_value
+    and the rest skipped with skip_value
+    """
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        """
+        :param fp: File object opened in text mode
+        :param chunk_size: Number of characters to read at a time
+        """
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        # Start of the value being decoded. Data before this can be dropped
+        self.mark = None
+        self.eof = False
+
+    def more(self):
+        """
+        Method to read the next chunk. Consumed data is dropped from the buffer
+
+        :return: False when the end of the file was reached
+        """
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        cut = self.pos if self.mark is None else self.mark
+        self.buf = self.buf[cut:] + chunk
+        self.pos -= cut
+        if self.mark is not None:
+            self.mark = 0
+        return True
+
+    def peek(self):
+        """
+        Method to skip whitespace and return the next character
+
+        :return: Next character or an empty string at the end of the file
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                return ""
+
+    def expect(self, chars):
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError(
+                "Expected {} but found {} in the json report".format(
+                    chars, c or "end of file"
+                )
+            )
+        self.pos += 1
+        return c
+
+    def skip_string(self):
+        """Method to move past a string. The position must be after the opening quote"""
+        while True:
+            m = STRING_CHARS.search(self.buf, self.pos)
+            if not m:
+                self.pos = len(self.buf)
+                if not self.more():
+                    raise ValueError("Unterminated string in the json report")
+                continue
+            if m.group() == '"':
+                self.pos = m.end()
+                return
+            # Escape sequence. Make sure the escaped character is available
+            self.pos = m.end()
+            while self.pos >= len(self.buf):
+                if not self.more():
+                    raise ValueError("Unterminated string in the json report")
+            self.pos += 1
+
+    def skip_value(self):
+        """Method to move past the next value without decoding it"""
+        c = self.peek()
+        if c == '"':
+            self.pos += 1
+            self.skip_string()
+        elif c in ("[", "{"):
+            self.pos += 1
+            depth = 1
+            while depth:
+                m = STRUCT_CHARS.search(self.buf, self.pos)
+                if not m:
+                    self.pos = len(self.buf)
+                    if not self.more():
+                        raise ValueError("Unterminated value in the json report")
+                    continue
+                self.pos = m.end()
+                ch = m.group()
+                if ch == '"':
+                    self.skip_string()
+                elif ch in "[{":
+                    depth += 1
+                else:
+                    depth -= 1
+        elif c:
+            while True:
+                m = SCALAR_END.search(self.buf, self.pos)
+                if m:
+                    self.pos = m.start()
+                    return
+                self.pos = len(self.buf)
+                if not self.more():
+                    return
+        else:
+            raise ValueError("Unexpected end of the json report")
+
+    def read_value(self):
+        """
+        Method to decode the next value
+
+        :return: Decoded value
+        """
+        self.peek()
+        self.mark = self.pos
+        try:
+            self.skip_value()
+            return json.loads(self.buf[self.mark : self.pos])
+        finally:
+            self.mark = None
+
+    def iter_array(self):
+        """
+        Generator to walk an array. The caller must consume exactly one value
+        for every iteration
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.expect(",]") == "]":
+                return
+
+    def iter_object(self):
+        """
+        Generator to walk an object yielding the keys. The caller must consume
+        exactly one value for every key
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                self.expect('"')
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def iter_path(self, path):
+        """
+        Generator to decode the elements of the array found at the given path
+
+        :param path: List of keys leading to an array. An empty list means the
+        document itself is an array
+        """
+        c = self.peek()
+        if not path:
+            if c == "[":
+                for _ in self.iter_array():
+                    yield self.read_value()
+            else:
+                self.skip_value()
+            return
+        if c != "{":
+            self.skip_value()
+            return
+        for key in self.iter_object():
+            if key == path[0]:
+                yield from self.iter_path(path[1:])
+            else:
+                self.skip_value()
+
+
+def iter_issues(fp, tool_name):
+    """
+    Generator to read the issues from the json report of the tool one at a
+    time. Issues are read from a top level array or from the known containers
+    in the top level object
+
+    :param fp: File object opened in text mode
+    :param tool_name: Tool name
+    """
+    stream = JSONStream(fp)
+    c = stream.peek()
+    if c == "[":
+        yield from stream.iter_path([])
+        return
+    if c != "{":
+        return
+    found = False
+    for key in stream.iter_object():
+        if found:
+            stream.skip_value()
+        elif tool_name == "inspect":
+            if key == "vulnerabilities":
+                found = True
+                yield from stream.iter_path([])
+            else:
+                stream.skip_value()
+        elif tool_name == "checkov":
+            if key == "results":
+                found = True
+                yield from stream.iter_path(["failed_checks"])
+            else:
+                stream.skip_value()
+        elif key == "sec_issues":
+            # NodeJsScan uses sec_issues
+            found = True
+            if stream.peek() != "{":
+                stream.skip_value()
+                continue
+            for _ in stream.iter_object():
+                if stream.peek() == "[":
+                    yield from stream.iter_path([])
+                else:
+                    yield stream.read_value()
+        elif key in ("Issues", "results"):
+            found = True
+            yield from stream.iter_path([])
+        else:
+            stream.skip_value()
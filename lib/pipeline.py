@@ -0,0 +1,186 @@
+# This file is part of Scan.
+
+# Scan is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Scan is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Scan.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Conversion stage of the scan. Raw tool reports are queued for conversion to
+SARIF as soon as the tool exits so that the conversion work overlaps with
+the tools that are still running
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait as wait_futures
+
+import lib.config as config
+import lib.convert as convertLib
+from lib.logger import LOG
+
+# Process pool used for conversions. None means convert inline
+conversion_pool = None
+
+# Pending conversions in the order they were queued
+pending_conversions = []
+
+pipeline_lock = threading.Lock()
+
+
+def create_pool(jobs):
+    """
+    Method to create the process pool. The workers are spawned rather than
+    forked since the tool threads run subprocesses and hold locks. A forked
+    worker would inherit the pipes of those subprocesses and the held locks
+
+    :param jobs: Number of conversion processes
+    :return: ProcessPoolExecutor
+    """
+    try:
+        return ProcessPoolExecutor(
+            max_workers=jobs, mp_context=multiprocessing.get_context("spawn")
+        )
+    except TypeError:
+        # python 3.6 can only fork. This is safe as long as the workers are
+        # started before the tool threads
+        return ProcessPoolExecutor(max_workers=jobs)
+
+
+def start_worker():
+    return os.getpid()
+
+
+def start(jobs=1):
+    """
+    Method to start the conversion stage. All the worker processes are started
+    here, before any of the tools are run
+
+    :param jobs: Number of conversion processes. Conversions are performed
+    inline when this is less than 2
+    """
+    global conversion_pool
+    with pipeline_lock:
+        if conversion_pool or not jobs or jobs < 2:
+            return
+        conversion_pool = create_pool(jobs)
+        # Workers are only started on demand when the tasks get submitted
+        wait_futures([conversion_pool.submit(start_worker) for _ in range(jobs)])
+
+
+def convert_worker(
+    runtime_values,
+    tool_name,
+    tool_args,
+    working_dir,
+    report_file,
+    converted_file,
+    file_path_list=None,
+    remove_report=False,
+):
+    """
+    Method to convert a single report inside the conversion process
+
+    :param runtime_values: Runtime config values from the parent process
+    :param tool_name: tool name
+    :param tool_args: tool args
+    :param working_dir: Working directory
+    :param report_file: Report file
+    :param converted_file: Converted file
+    :param file_path_list: Full file path for any manipulation
+    :param remove_report: Boolean to remove the raw report after conversion
+
+    :return converted_file: Converted file name
+    """
+    # Child processes may not inherit the runtime config of the parent
+    config.runtimeValues.update(runtime_values)
+    convertLib.convert_file(
+        tool_name,
+        tool_args,
+        working_dir,
+        report_file,
+        converted_file,
+        file_path_list,
+    )
+    if remove_report:
+        try:
+            if not os.environ.get("SCAN_DEBUG_MODE") == "debug":
+                os.remove(report_file)
+        except Exception:
+            LOG.debug("Unable to remove file {}".format(report_file))
+    return converted_file
+
+
+def convert_file(
+    tool_name,
+    tool_args,
+    working_dir,
+    report_file,
+    converted_file,
+    file_path_list=None,
+    remove_report=False,
+):
+    """
+    Method to queue a report for conversion. The conversion happens inline if
+    the conversion stage was not started
+
+    :param tool_name: tool name
+    :param tool_args: tool args
+    :param working_dir: Working directory
+    :param report_file: Report file
+    :param converted_file: Converted file
+    :param file_path_list: Full file path for any manipulation
+    :param remove_report: Boolean to remove the raw report after conversion
+    """
+    args = (
+        dict(config.runtimeValues),
+        tool_name,
+        tool_args,
+        working_dir,
+        report_file,
+        converted_file,
+        file_path_list,
+        remove_report,
+    )
+    with pipeline_lock:
+        if conversion_pool:
+            LOG.debug("Queued {} for conversion".format(report_file))
+            pending_conversions.append(
+                (report_file, conversion_pool.submit(convert_worker, *args))
+            )
+            return
+    convert_worker(*args)
+
+
+def wait():
+    """
+    Method to wait for all the queued conversions to complete and stop the
+    conversion stage
+
+    :return: List of converted files
+    """
+    global conversion_pool
+    with pipeline_lock:
+        pool = conversion_pool
+        conversions = list(pending_conversions)
+        conversion_pool = None
+        pending_conversions.clear()
+    converted_files = []
+    for report_file, future in conversions:
+        try:
+            converted_files.append(future.result())
+        except Exception as e:
+            LOG.error(e)
+            LOG.warning("Unable to convert the report {}".format(report_file))
+    if pool:
+        pool.shutdown()
+    return converted_files
@@ -0,0 +1,311 @@
+# This file is part of Scan.
+
+# Scan is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Scan is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Scan.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Batched PMD runs. All the PMD backed project types found in a repo are
+analysed by a single multi-threaded PMD process and the results are split back
+into one report per type
+"""
+
+import csv
+import os
+import re
+
+import lib.config as config
+import lib.utils as utils
+from lib.cache import hash_key
+from lib.logger import LOG
+
+# File extensions handled by PMD for each of the reports
+PMD_LANGUAGE_EXTENSIONS = {
+    "source-apex": [".cls", ".trigger"],
+    "source-java": [".java"],
+    "source-jsp": [".jsp", ".jspx", ".jspf", ".tag"],
+    "source-sql": [
+        ".sql",
+        ".trg",
+        ".prc",
+        ".fnc",
+        ".pld",
+        ".pls",
+        ".plh",
+        ".plb",
+        ".pck",
+        ".pks",
+        ".pkh",
+        ".pkb",
+        ".typ",
+        ".tyb",
+        ".tps",
+        ".tpb",
+    ],
+    "source-vf": [".page", ".component"],
+    "source-vm": [".vm"],
+}
+
+# PMD languages of the reports along with the other languages PMD has rules for
+PMD_LANGUAGES = {
+    "apex": "source-apex",
+    "java": "source-java",
+    "jsp": "source-jsp",
+    "plsql": "source-sql",
+    "vf": "source-vf",
+    "vm": "source-vm",
+}
+PMD_OTHER_EXTENSIONS = {
+    "pom": [".pom"],
+    "wsdl": [".wsdl"],
+    "xml": [".xml"],
+    "xsl": [".xsl", ".xslt"],
+}
+
+
+def get_pmd_tool(type_str, scan_mode=""):
+    """
+    Method to identify if the given project type is scanned only with PMD
+
+    :param type_str: Project type
+    :param scan_mode: Scan mode string
+    :return: Report name such as source-apex or None if the type cannot be batched
+    """
+    scan_tools_args_map = config.get("scan_tools_args_map")
+    cmd_map_list = None
+    if scan_mode:
+        cmd_map_list = scan_tools_args_map.get(type_str + "-" + scan_mode)
+    if not cmd_map_list:
+        cmd_map_list = scan_tools_args_map.get(type_str)
+    if not isinstance(cmd_map_list, dict) or len(cmd_map_list) != 1:
+        return None
+    tool_name, cmd = list(cmd_map_list.items())[0]
+    if tool_name in PMD_LANGUAGE_EXTENSIONS and is_pmd_cmd(cmd):
+        return tool_name
+    return None
+
+
+def is_pmd_cmd(cmd_args):
+    """
+    Method to check if the command runs PMD
+
+    :param cmd_args: Command as a list
+    :return: True if the command starts with PMD_CMD
+    """
+    pmd_cmd = config.get("PMD_CMD").split(" ")
+    return cmd_args[: len(pmd_cmd)] == pmd_cmd
+
+
+def use_incremental_cache(cmd_args, src, tool_name):
+    """
+    Method to replace -no-cache with a persistent PMD analysis cache when
+    SCAN_PMD_CACHE_DIR is set. The cache file is specific to the project,
+    the report and the contents of the ruleset so that PMD only re-analyses
+    the files that changed since the previous run
+
+    :param cmd_args: PMD command as a list
+    :param src: Source directory
+    :param tool_name: Report name such as source-apex
+    :return: Command as a list
+    """
+    cache_dir = config.get("SCAN_PMD_CACHE_DIR")
+    if not cache_dir or "-no-cache" not in cmd_args:
+        return cmd_args
+    ruleset = ""
+    if "-R" in cmd_args and cmd_args.index("-R") + 1 < len(cmd_args):
+        ruleset = cmd_args[cmd_args.index("-R") + 1]
+    try:
+        with open(ruleset, mode="rb") as fp:
+            ruleset_key = hash_key(fp.read())
+    except OSError:
+        ruleset_key = ruleset
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        LOG.debug(e)
+        return cmd_args
+    cache_key = hash_key(os.path.abspath(src), tool_name, ruleset_key)
+    cache_file = os.path.join(cache_dir, "pmd-{}.cache".format(cache_key))
+    idx = cmd_args.index("-no-cache")
+    return cmd_args[:idx] + ["-cache", cache_file] + cmd_args[idx + 1 :]
+
+
+def get_tool_for_file(filename, tool_names):
+    """
+    Method to find the report a file belongs to based on the extension
+
+    :param filename: File name reported by PMD
+    :param tool_names: Report names included in the run
+    :return: Report name or None
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    for tool_name in tool_names:
+        if ext in PMD_LANGUAGE_EXTENSIONS[tool_name]:
+            return tool_name
+    return None
+
+
+def get_ruleset():
+    """
+    Method to return the ruleset used for the PMD runs
+
+    :return: Path to the ruleset
+    """
+    return config.get("APP_SRC_DIR") + "/rules-pmd.xml"
+
+
+def get_ruleset_extensions(ruleset):
+    """
+    Method to find the file extensions PMD analyses for the given ruleset.
+    PMD picks the files based on the languages of the rules and not the
+    -language argument, which only sets the default language version
+
+    :param ruleset: Path to the ruleset
+    :return: List of file extensions
+    """
+    try:
+        with open(ruleset) as fp:
+            languages = set(re.findall(r'category/(\w+)/|language="(\w+)"', fp.read()))
+        languages = {lang for match in languages for lang in match if lang}
+    except OSError as e:
+        LOG.debug(e)
+        languages = set(PMD_LANGUAGES) | set(PMD_OTHER_EXTENSIONS)
+    extensions = []
+    for lang in sorted(languages):
+        if lang in PMD_LANGUAGES:
+            extensions += PMD_LANGUAGE_EXTENSIONS[PMD_LANGUAGES[lang]]
+        else:
+            extensions += PMD_OTHER_EXTENSIONS.get(lang, [])
+    return extensions
+
+
+def find_source_files(src, extensions):
+    """
+    Method to find the files PMD would analyse with -d src. Unlike the
+    inventory no directories are ignored
+
+    :param src: Source directory
+    :param extensions: List of file extensions
+    :return: List of files
+    """
+    extensions = tuple(extensions)
+    files = []
+    for root, dirs, fnames in os.walk(src):
+        dirs.sort()
+        for fname in sorted(fnames):
+            if fname.lower().endswith(extensions):
+                files.append(os.path.join(root, fname))
+    return files
+
+
+def write_filelist(src, filelist_fname, ruleset=None):
+    """
+    Method to write the list of files to analyse in the format used by the
+    PMD -filelist argument. The list has the same files as the separate runs
+    with -d src. PMD treats commas as separators even with one path per line,
+    so files with a comma in the path are skipped
+
+    :param src: Source directory
+    :param filelist_fname: File to write
+    :param ruleset: Path to the ruleset
+    :return: Number of files in the list
+    """
+    files = []
+    extensions = get_ruleset_extensions(ruleset or get_ruleset())
+    for fname in find_source_files(src, extensions):
+        if "," in fname:
+            LOG.warning(
+                "{} cannot be analysed by the batched PMD run since the path has a comma".format(
+                    fname
+                )
+            )
+            continue
+        files.append(fname)
+    with open(filelist_fname, mode="w") as fp:
+        fp.write("\n".join(files))
+    return len(files)
+
+
+def build_batch_cmd(report_fname, filelist_fname, threads):
+    """
+    Method to construct the command for a single PMD run over all the files
+
+    :param report_fname: csv report to write
+    :param filelist_fname: File with the list of files to analyse
+    :param threads: Number of threads for PMD
+    :return: Command as a list
+    """
+    return [
+        *config.get("PMD_CMD").split(" "),
+        "-no-cache",
+        "--failOnViolation",
+        "false",
+        "-threads",
+        str(threads),
+        "-filelist",
+        filelist_fname,
+        "-r",
+        report_fname,
+        "-f",
+        "csv",
+        "-R",
+        get_ruleset(),
+    ]
+
+
+def split_report(report_fname, reports_dir, tool_names, convert):
+    """
+    Method to split the combined csv report into one report per type. Results
+    for files of the other languages in the ruleset, such as xml, are included
+    in every report like the separate runs did
+
+    :param report_fname: Combined csv report
+    :param reports_dir: Directory for output reports
+    :param tool_names: Report names included in the run
+    :param convert: Boolean to enable normalisation of reports json
+    :return: dict of report name to the csv report file
+    """
+    report_files = {}
+    writers = {}
+    outputs = []
+    try:
+        with open(report_fname, newline="") as fp:
+            reader = csv.reader(fp, delimiter=",")
+            headers = next(reader, None)
+            if not headers:
+                return report_files
+            file_idx = [h.lower() for h in headers].index("file")
+            # Every type gets a report even without any results
+            for tool_name in tool_names:
+                fname = utils.get_report_file(
+                    tool_name, reports_dir, convert, ext_name="csv"
+                )
+                out = open(fname, mode="w", newline="")
+                outputs.append(out)
+                writers[tool_name] = csv.writer(
+                    out, quoting=csv.QUOTE_ALL, lineterminator="\n"
+                )
+                writers[tool_name].writerow(headers)
+                report_files[tool_name] = fname
+            for row in reader:
+                if len(row) <= file_idx:
+                    continue
+                tool_name = get_tool_for_file(row[file_idx], tool_names)
+                if tool_name:
+                    writers[tool_name].writerow(row)
+                    continue
+                for writer in writers.values():
+                    writer.writerow(row)
+    finally:
+        for out in outputs:
+            out.close()
+    return report_files
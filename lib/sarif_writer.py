@@ -0,0 +1,212 @@
+# This file is part of Scan.
+
+# Scan is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Scan is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Scan.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Streaming writer for SARIF 2.1.0 logs. Runs and results are plain dicts using
+the SARIF property names and get written one at a time, so a log never needs
+to be held in memory as a whole. The output is laid out the same way as the
+sarif_om object model serialized with jschema_to_python
+"""
+
+import io
+import json
+import tempfile
+
+SCHEMA_URI = "https://raw.githubusercontent.com/oasis-tcs/sarif-spec/master/Schemata/sarif-schema-2.1.0.json"
+
+SARIF_VERSION = "2.1.0"
+
+INDENT = "  "
+
+COPY_BUFSIZE = 1024 * 1024
+
+
+def omit_none(obj, keep=()):
+    """
+    Method to remove the properties without a value. The object model omits
+    such optional properties from the log
+
+    :param obj: Dict with SARIF property names
+    :param keep: Required properties to retain even without a value
+    :return: Dict without the empty properties
+    """
+    return {k: v for k, v in obj.items() if v is not None or k in keep}
+
+
+def dumps(value, level):
+    """
+    Method to serialize a value nested at the given level
+
+    :param value: Value to serialize
+    :param level: Nesting level of the value
+    :return: json string
+    """
+    # Strings never contain a raw newline so it is safe to indent this way
+    return json.dumps(value, indent=2).replace("\n", "\n" + INDENT * level)
+
+
+class ResultSpool(object):
+    """
+    Results serialized to a temporary file until the run gets written. This
+    allows the rules and metrics, which precede the results in the log, to be
+    collected while the results are produced
+    """
+
+    def __init__(self):
+        self.fp = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        self.count = 0
+        # Length of each serialized result so they can be read back one by one
+        self.sizes = []
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """
+        Method to read the results back one at a time. Results must not be
+        appended while iterating
+        """
+        self.fp.seek(0)
+        try:
+            for idx, size in enumerate(self.sizes):
+                if idx:
+                    self.fp.read(2)
+                yield json.loads(self.fp.read(size))
+        finally:
+            self.fp.seek(0, io.SEEK_END)
+
+    def append(self, result):
+        """
+        Method to add a result
+
+        :param result: Result dict
+        """
+        if self.count:
+            self.fp.write(",\n")
+        data = json.dumps(result, indent=2)
+        self.fp.write(data)
+        self.sizes.append(len(data))
+        self.count += 1
+
+    def write_to(self, fp, level):
+        """
+        Method to copy the results as an array nested at the given level
+
+        :param fp: Output file object
+        :param level: Nesting level of the array
+        """
+        if not self.count:
+            fp.write("[]")
+            return
+        item_indent = INDENT * (level + 1)
+        fp.write("[\n" + item_indent)
+        self.fp.seek(0)
+        while True:
+            chunk = self.fp.read(COPY_BUFSIZE)
+            if not chunk:
+                break
+            fp.write(chunk.replace("\n", "\n" + item_indent))
+        fp.write("\n" + INDENT * level + "]")
+
+    def close(self):
+        self.fp.close()
+
+
+def write_array(fp, items, level, write_item):
+    """
+    Method to write the items as an array without holding them in memory
+
+    :param fp: Output file object
+    :param items: Iterable of items
+    :param level: Nesting level of the array
+    :param write_item: Function to write a single item
+    """
+    item_indent = INDENT * (level + 1)
+    empty = True
+    for item in items:
+        fp.write(("[\n" if empty else ",\n") + item_indent)
+        write_item(fp, item, level + 1)
+        empty = False
+    if empty:
+        fp.write("[]")
+    else:
+        fp.write("\n" + INDENT * level + "]")
+
+
+def write_value(fp, value, level):
+    """
+    Method to write a value. Result spools and generators are streamed
+
+    :param fp: Output file object
+    :param value: Value to write
+    :param level: Nesting level of the value
+    """
+    if isinstance(value, ResultSpool):
+        value.write_to(fp, level)
+    elif isinstance(value, (dict, list, str)) or not hasattr(value, "__next__"):
+        fp.write(dumps(value, level))
+    else:
+        # Generators of results
+        write_array(fp, value, level, write_value)
+
+
+def write_run(fp, run, level):
+    """
+    Method to write a single run. Results can be a list, a ResultSpool or a
+    generator
+
+    :param fp: Output file object
+    :param run: Run dict
+    :param level: Nesting level of the run
+    """
+    if not run:
+        fp.write("{}")
+        return
+    key_indent = INDENT * (level + 1)
+    first = True
+    for key, value in run.items():
+        fp.write(("{\n" if first else ",\n") + key_indent + json.dumps(key) + ": ")
+        write_value(fp, value, level + 1)
+        first = False
+    fp.write("\n" + INDENT * level + "}")
+
+
+def get_inline_properties(log_uuid, run_uuid=None):
+    """
+    Method to construct the inline external properties of a log
+
+    :param log_uuid: Log guid
+    :param run_uuid: Optional run guid
+    :return: List with the properties dict
+    """
+    return [omit_none({"guid": log_uuid, "runGuid": run_uuid})]
+
+
+def write_log(fp, runs, log_uuid, run_uuid=None):
+    """
+    Method to write a SARIF log
+
+    :param fp: Output file object
+    :param runs: Iterable of run dicts
+    :param log_uuid: Log guid
+    :param run_uuid: Optional run guid
+    """
+    fp.write("{\n" + INDENT + '"runs": ')
+    write_array(fp, runs, 1, write_run)
+    fp.write(",\n" + INDENT + '"version": ' + json.dumps(SARIF_VERSION))
+    fp.write(",\n" + INDENT + '"$schema": ' + json.dumps(SCHEMA_URI))
+    fp.write(",\n" + INDENT + '"inlineExternalProperties": ')
+    fp.write(dumps(get_inline_properties(log_uuid, run_uuid), 1))
+    fp.write("\n}")
@@ -0,0 +1,339 @@
+# This file is part of Scan.
+
+# Scan is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Scan is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Scan.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Source code snippets for the findings. Files are indexed by line on first use.
+Large files are memory mapped while small ones are read and closed right away.
+Only a bounded number of bytes and mapped files are held at any time with the
+least recently used files getting released first
+"""
+
+import mmap
+import os
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+import lib.config as config
+from lib.logger import LOG
+from lib.utils import calculate_line_hash
+
+# Default limit for the bytes held by the snippet provider
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Default limit for the memory mapped files. Every map keeps a file descriptor open
+MAX_MAPPED_FILES = 64
+
+# Files smaller than this are read into memory instead of being mapped
+MMAP_MIN_BYTES = 256 * 1024
+
+
+class SourceFile(object):
+    """
+    Source file contents with an index of the line offsets
+    """
+
+    __slots__ = ("path", "size", "data", "offsets", "line_hashes", "occurrences")
+
+    def __init__(self, path):
+        """
+        :param path: File path
+        """
+        self.path = path
+        self.data = b""
+        self.offsets = None
+        self.line_hashes = None
+        self.occurrences = None
+        with open(path, mode="rb") as fp:
+            self.size = os.fstat(fp.fileno()).st_size
+            # Empty files cannot be mapped
+            if self.size and self.size >= MMAP_MIN_BYTES:
+                self.data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = fp.read()
+
+    def is_mapped(self):
+        return isinstance(self.data, mmap.mmap)
+
+    def nbytes(self):
+        """Approximate number of bytes held for this file"""
+        nbytes = self.size
+        if self.offsets is not None:
+            nbytes += self.offsets.itemsize * len(self.offsets)
+        if self.line_hashes is not None:
+            nbytes += sys.getsizeof(self.line_hashes)
+            nbytes += self.occurrences.itemsize * len(self.occurrences)
+        return nbytes
+
+    def build_index(self):
+        """Method to build the index of line start offsets"""
+        offsets = array("Q", [0])
+        data = self.data
+        pos = data.find(b"\n")
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = data.find(b"\n", pos + 1)
+        # No line starts at the very end of the file
+        if offsets[-1] == self.size:
+            offsets.pop()
+        self.offsets = offsets
+
+    def line_count(self):
+        if self.offsets is None:
+            self.build_index()
+        return len(self.offsets)
+
+    def get_line(self, lineno):
+        """
+        Method to retrieve a single line. Line endings are normalised to \\n
+        and the last line of the file always ends with \\n
+
+        :param lineno: Line number starting from 1
+        :return: Line text or an empty string when the line does not exist
+        """
+        if self.offsets is None:
+            self.build_index()
+        if lineno < 1 or lineno > len(self.offsets):
+            return ""
+        start = self.offsets[lineno - 1]
+        end = self.offsets[lineno] if lineno < len(self.offsets) else self.size
+        text = self.data[start:end].decode("utf-8", errors="replace")
+        return text.rstrip("\r\n") + "\n"
+
+    def get_lines(self, lmin, lmax):
+        """
+        Method to retrieve the lines in the given range
+
+        :param lmin: First line number
+        :param lmax: Line number to stop before
+        :return: List of (lineno, text) tuples. The list stops at the end of the file
+        """
+        lines = []
+        for lineno in range(lmin, lmax):
+            text = self.get_line(lineno)
+            if not text:
+                break
+            lines.append((lineno, text))
+        return lines
+
+    def iter_lines(self):
+        """Generator yielding (lineno, text) for every line in the file"""
+        for lineno in range(1, self.line_count() + 1):
+            yield lineno, self.get_line(lineno)
+
+    def build_line_hashes(self):
+        """
+        Method to index the lines by their stripped text in a single pass. For
+        every stripped text the first line number is recorded. For every line
+        the number of times its stripped text occurred up to that line is
+        recorded
+        """
+        line_hashes = {}
+        counts = {}
+        occurrences = array("L", [0])
+        for lineno, line in self.iter_lines():
+            h = hash(line.strip())
+            line_hashes.setdefault(h, lineno)
+            counts[h] = counts.get(h, 0) + 1
+            occurrences.append(counts[h])
+        self.line_hashes = line_hashes
+        self.occurrences = occurrences
+
+    def get_fingerprint(self, lineno, file_name):
+        """
+        Method to compute a fingerprint for the line that survives line shifts.
+        The fingerprint is based on the stripped line text and the number of
+        times the same text occurred up to that line in the file
+
+        :param lineno: Line number
+        :param file_name: File name to include in the hash
+        :return: Fingerprint in the hash:occurrence format or None if the line does not exist
+        """
+        line = self.get_line(lineno)
+        if not line:
+            return None
+        if self.line_hashes is None:
+            self.build_line_hashes()
+        return "{}:{}".format(
+            calculate_line_hash(file_name, None, line), self.occurrences[lineno]
+        )
+
+    def find_line(self, text):
+        """
+        Method to find the first line with the same text ignoring the leading
+        and trailing whitespace. The map from the stripped line hash to the line
+        number is built in a single pass on first use
+
+        :param text: Line text
+        :return: Line number or None if no line matches
+        """
+        if self.line_hashes is None:
+            self.build_line_hashes()
+        text = text.strip()
+        lineno = self.line_hashes.get(hash(text))
+        if lineno is None or self.get_line(lineno).strip() == text:
+            return lineno
+        # Hash collision
+        for lineno, line in self.iter_lines():
+            if line.strip() == text:
+                return lineno
+        return None
+
+    def close(self):
+        if self.is_mapped():
+            self.data.close()
+        self.data = b""
+        self.offsets = None
+        self.line_hashes = None
+        self.occurrences = None
+
+
+class SnippetProvider(object):
+    """
+    LRU cache of source files bounded by the bytes held and the number of
+    memory mapped files
+    """
+
+    def __init__(self, max_bytes=None, max_maps=None):
+        """
+        :param max_bytes: Maximum bytes to hold. Defaults to SCAN_SNIPPET_CACHE_BYTES
+        :param max_maps: Maximum files to keep mapped. Defaults to SCAN_SNIPPET_MAX_MAPS
+        """
+        if max_bytes is None:
+            max_bytes = int(config.get("SCAN_SNIPPET_CACHE_BYTES", MAX_CACHE_BYTES))
+        if max_maps is None:
+            max_maps = int(config.get("SCAN_SNIPPET_MAX_MAPS", MAX_MAPPED_FILES))
+        self.max_bytes = max_bytes
+        self.max_maps = max_maps
+        self.files = OrderedDict()
+        self.held_bytes = 0
+        self.mapped_files = 0
+        self.lock = threading.Lock()
+
+    def get_file(self, path):
+        """
+        Method to retrieve the source file for the given path
+
+        :param path: File path
+        :return: SourceFile or None if the file cannot be read
+        """
+        with self.lock:
+            return self.load(path)
+
+    def load(self, path):
+        if path in self.files:
+            self.files.move_to_end(path)
+            return self.files[path]
+        try:
+            source = SourceFile(path)
+        except (OSError, ValueError) as e:
+            # Not cached since the file could become readable later
+            LOG.debug(e)
+            return None
+        self.held_bytes += source.nbytes()
+        if source.is_mapped():
+            self.mapped_files += 1
+        self.files[path] = source
+        self.evict()
+        return source
+
+    def get_lines(self, path, lmin, lmax):
+        """
+        Method to retrieve the lines in the given range
+
+        :param path: File path
+        :param lmin: First line number
+        :param lmax: Line number to stop before
+        :return: List of (lineno, text) tuples
+        """
+        with self.lock:
+            source = self.load(path)
+            if source is None:
+                return []
+            nbytes = source.nbytes()
+            lines = source.get_lines(lmin, lmax)
+            # Account for the line index built on first use
+            self.held_bytes += source.nbytes() - nbytes
+            self.evict()
+            return lines
+
+    def find_line(self, path, text):
+        """
+        Method to find the line number for a snippet reported by tools such
+        as gitleaks that do not report line numbers
+
+        :param path: File path
+        :param text: Line text
+        :return: Line number or None if no line matches
+        """
+        with self.lock:
+            source = self.load(path)
+            if source is None:
+                return None
+            nbytes = source.nbytes()
+            lineno = source.find_line(text)
+            self.held_bytes += source.nbytes() - nbytes
+            self.evict()
+            return lineno
+
+    def get_fingerprints(self, path, file_name, linenos):
+        """
+        Method to compute the fingerprints for a batch of lines in a file
+
+        :param path: File path
+        :param file_name: File name to include in the hash. Usually relative to
+        the source directory so that the fingerprints do not depend on the checkout location
+        :param linenos: List of line numbers
+        :return: Dict of line number to fingerprint for the lines that exist
+        """
+        with self.lock:
+            source = self.load(path)
+            if source is None:
+                return {}
+            nbytes = source.nbytes()
+            fingerprints = {}
+            for lineno in linenos:
+                if lineno in fingerprints:
+                    continue
+                fingerprint = source.get_fingerprint(lineno, file_name)
+                if fingerprint:
+                    fingerprints[lineno] = fingerprint
+            self.held_bytes += source.nbytes() - nbytes
+            self.evict()
+            return fingerprints
+
+    def evict(self):
+        """Method to release the least recently used files above the limits"""
+        while (
+            self.held_bytes > self.max_bytes or self.mapped_files > self.max_maps
+        ) and len(self.files) > 1:
+            _, source = self.files.popitem(last=False)
+            self.held_bytes -= source.nbytes()
+            if source.is_mapped():
+                self.mapped_files -= 1
+            source.close()
+
+    def clear(self):
+        with self.lock:
+            for source in self.files.values():
+                source.close()
+            self.files.clear()
+            self.held_bytes = 0
+            self.mapped_files = 0
+
+
+# Provider shared by all the conversions in this process
+snippets = SnippetProvider()
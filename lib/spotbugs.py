@@ -0,0 +1,260 @@
+# This file is part of Scan.
+
+# Scan is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Scan is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Scan.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Parallel SpotBugs runs for multi-module builds. The class output directory of
+every module is found next to its build file and the modules are analysed in
+groups by separate SpotBugs processes along with any other classes and
+archives under the source directory. The xml reports are then merged into a
+single report
+"""
+
+import os
+import zipfile
+from xml.etree.ElementTree import tostring
+from xml.sax.saxutils import quoteattr
+
+from defusedxml.ElementTree import iterparse
+
+from lib.logger import LOG
+
+# Class output directories relative to the build file of each module
+MODULE_OUTPUT_DIRS = {
+    "pom.xml": [os.path.join("target", "classes")],
+    "build.gradle": [
+        os.path.join("build", "classes", "java", "main"),
+        os.path.join("build", "classes", "kotlin", "main"),
+    ],
+    "build.gradle.kts": [
+        os.path.join("build", "classes", "java", "main"),
+        os.path.join("build", "classes", "kotlin", "main"),
+    ],
+}
+
+# Files analysed by SpotBugs when a directory is passed as the target
+TARGET_EXTENSIONS = (".class", ".jar", ".war", ".ear", ".zip")
+
+# Default limit for the parallel SpotBugs processes. Each one is a separate jvm
+MAX_JOBS = 4
+
+# Elements describing the bug patterns. These are repeated in every report
+PATTERN_KEYS = {"BugCategory": "category", "BugPattern": "type", "BugCode": "abbrev"}
+
+
+def count_class_files(path):
+    count = 0
+    for _, _, files in os.walk(path):
+        count += sum(1 for f in files if f.endswith(".class"))
+    return count
+
+
+def count_archive_classes(path):
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return sum(1 for n in zf.namelist() if n.endswith(".class"))
+    except (OSError, zipfile.BadZipFile):
+        return 0
+
+
+def has_targets(path):
+    for _, _, files in os.walk(path):
+        if any(f.endswith(TARGET_EXTENSIONS) for f in files):
+            return True
+    return False
+
+
+def find_module_dirs(build_files):
+    """
+    Method to find the class output directories of the modules
+
+    :param build_files: List of maven and gradle build files
+    :return: List of (directory, number of class files) tuples
+    """
+    module_dirs = []
+    for build_file in build_files:
+        build_dir = os.path.dirname(build_file)
+        for output_dir in MODULE_OUTPUT_DIRS.get(os.path.basename(build_file), []):
+            class_dir = os.path.join(build_dir, output_dir)
+            if not os.path.isdir(class_dir):
+                continue
+            count = count_class_files(class_dir)
+            if count:
+                module_dirs.append((class_dir, count))
+    return module_dirs
+
+
+def find_residual_targets(src, module_dirs):
+    """
+    Method to find the classes and archives under the source directory that
+    are outside of the module class directories. A run over the whole source
+    directory would analyse these as well, so they get grouped along with the
+    modules. Directories without any module inside are returned as a whole
+
+    :param src: Source directory
+    :param module_dirs: List of (directory, number of class files) tuples
+    :return: List of (directory or file, number of class files) tuples
+    """
+    src = os.path.normpath(src)
+    excluded = {os.path.normpath(class_dir) for class_dir, _ in module_dirs}
+    # Directories containing a module directory need to be split further
+    parents = set()
+    for class_dir in excluded:
+        parent = os.path.dirname(class_dir)
+        while parent not in parents and parent.startswith(src):
+            parents.add(parent)
+            if parent == src:
+                break
+            parent = os.path.dirname(parent)
+    targets = []
+    for root, dirs, files in os.walk(src):
+        root = os.path.normpath(root)
+        if root not in parents:
+            if has_targets(root):
+                targets.append((root, max(count_class_files(root), 1)))
+            dirs[:] = []
+            continue
+        for f in sorted(files):
+            fpath = os.path.join(root, f)
+            if f.endswith(".class"):
+                targets.append((fpath, 1))
+            elif f.endswith(TARGET_EXTENSIONS):
+                targets.append((fpath, max(count_archive_classes(fpath), 1)))
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) not in excluded)
+    return targets
+
+
+def group_modules(module_dirs, max_groups):
+    """
+    Method to split the modules into groups of similar size. The largest
+    modules are assigned first to the group with the fewest classes
+
+    :param module_dirs: List of (directory, number of class files) tuples
+    :param max_groups: Maximum number of groups
+    :return: List of lists of directories
+    """
+    groups = [[] for _ in range(max(1, min(max_groups, len(module_dirs))))]
+    sizes = [0] * len(groups)
+    for class_dir, count in sorted(module_dirs, key=lambda m: (-m[1], m[0])):
+        idx = sizes.index(min(sizes))
+        groups[idx].append(class_dir)
+        sizes[idx] += count
+    return [sorted(g) for g in groups if g]
+
+
+def format_start_tag(tag, attrib):
+    return "<{}{}>".format(
+        tag, "".join(" {}={}".format(k, quoteattr(v)) for k, v in attrib.items())
+    )
+
+
+def write_element(out, element):
+    element.tail = None
+    out.write("  " + tostring(element, encoding="unicode") + "\n")
+
+
+def iter_top_elements(report_file):
+    """
+    Method to read the top level elements of an xml report incrementally. The
+    root element is yielded first, at its start tag, followed by each of its
+    children once they are complete. The root is cleared after every child
+
+    :param report_file: xml report
+    :return: Generator of the root element and its children
+    """
+    depth = 0
+    root = None
+    for event, child in iterparse(report_file, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = child
+                yield root
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield child
+            root.clear()
+
+
+def merge_summary(summary, attrib):
+    """
+    Method to add up the numeric attributes of the FindBugsSummary elements
+
+    :param summary: Summary attributes merged so far or None
+    :param attrib: Attributes of the summary to add
+    :return: Merged summary attributes
+    """
+    if summary is None:
+        return dict(attrib)
+    for k, v in attrib.items():
+        if v.isdigit() and summary.get(k, "0").isdigit():
+            summary[k] = str(int(summary.get(k, "0")) + int(v))
+    return summary
+
+
+def merge_reports(report_files, output_file):
+    """
+    Method to merge the xml reports of several SpotBugs runs. The reports are
+    read incrementally so only one top level element is held at a time. The
+    bug instances are concatenated, the bug patterns are de-duplicated and
+    the numeric attributes of the summaries are added up
+
+    :param report_files: List of xml reports
+    :param output_file: Merged xml report to write
+    :return: Number of bug instances
+    """
+    seen_patterns = set()
+    summary = None
+    root_attrib = None
+    project_written = False
+    count = 0
+    with open(output_file, mode="w", encoding="utf-8") as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n\n')
+        for report_file in report_files:
+            if not os.path.isfile(report_file):
+                continue
+            try:
+                elements = iter_top_elements(report_file)
+                root = next(elements, None)
+                if root is not None and root_attrib is None:
+                    root_attrib = dict(root.attrib)
+                    out.write(format_start_tag(root.tag, root_attrib))
+                    out.write("\n")
+                for child in elements:
+                    tag = child.tag
+                    if tag == "FindBugsSummary":
+                        summary = merge_summary(summary, child.attrib)
+                    elif tag == "Project":
+                        if not project_written:
+                            write_element(out, child)
+                            project_written = True
+                    elif tag in PATTERN_KEYS:
+                        key = (tag, child.attrib.get(PATTERN_KEYS[tag]))
+                        if key not in seen_patterns:
+                            seen_patterns.add(key)
+                            write_element(out, child)
+                    elif tag == "BugInstance":
+                        count += 1
+                        write_element(out, child)
+            except Exception as e:
+                # A failed run should not lose the results of the other modules
+                LOG.debug("Unable to merge {}: {}".format(report_file, e))
+        if root_attrib is None:
+            out.write("<BugCollection>\n")
+        if summary is not None:
+            out.write("  " + format_start_tag("FindBugsSummary", summary))
+            out.write("</FindBugsSummary>\n")
+        out.write("</BugCollection>\n")
+    return count
@@ -13,18 +13,38 @@
 # You should have received a copy of the GNU General Public License
 # along with Scan.  If not, see <https://www.gnu.org/licenses/>.
 
+import math
 import os
-import re
 import shutil
 import tempfile
+import threading
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import blake2b
 from pathlib import Path
 
+from git import Git
+
+import lib.cache as cache
 import lib.config as config
+from lib.ignore import get_matcher, get_results_matcher
+from lib.logger import LOG
 
 HASH_DIGEST_SIZE = 16
 
+# Directories modified this close to the listing are not trusted from the cache
+# since a later change within the same mtime tick would go unnoticed
+RACY_MTIME_NS = 2 * 10**9
+
+# Python requirements files used for project type detection
+python_req_files = ["requirements.txt", "Pipfile", "Pipfile.lock", "conda.yml"]
+
+# File inventories built during this run keyed by the source directory
+inventories = {}
+
+inventory_lock = threading.Lock()
+
 
 def is_ignored_dir(base_dir, dir_name):
     """
@@ -33,14 +53,20 @@ def is_ignored_dir(base_dir, dir_name):
     :param dir_name: Directory to compare
     :return:
     """
-    if dir_name.startswith("/" + base_dir):
-        dir_name = re.sub(r"^/" + base_dir + "/", "", dir_name)
-    elif dir_name.startswith(base_dir):
-        dir_name = re.sub(r"^" + base_dir + "/", "", dir_name)
-    for d in config.ignore_directories:
-        if dir_name == d or dir_name.startswith(d) or (d + "/") in dir_name:
-            return True
-    return False
+    return get_matcher(base_dir).is_ignored(dir_name, is_dir=True)
+
+
+def is_ignored_file(base_dir, file_name):
+    """
+    Method to find if the findings for the given file should be ignored either
+    directly or because it belongs to an ignored directory. Only the ignore
+    directories and .sastscanignore are used since files matching .gitignore
+    could still be committed
+    :param base_dir: Base directory
+    :param file_name: File to compare
+    :return:
+    """
+    return get_results_matcher(base_dir).is_ignored(file_name)
 
 
 def find_path_prefix(base_dir, file_name):
@@ -51,20 +77,238 @@ def find_path_prefix(base_dir, file_name):
     :param file_name: Filename to search
     :return: Path prefix to be added to the filename
     """
-    file_path_obj = Path(file_name)
-    base_dir_obj = Path(base_dir)
-    if file_path_obj.is_absolute():
+    if Path(file_name).is_absolute():
         return ""
     tmpf = os.path.join(base_dir, file_name)
     if os.path.exists(tmpf):
         return ""
-    for f in base_dir_obj.rglob(file_path_obj.name):
-        if not is_ignored_dir(base_dir, f.parent.name):
-            ppath = f.as_posix()
-            if ppath.endswith(file_path_obj.name):
-                retpath = re.sub("^" + base_dir + "/", "", ppath)
-                return retpath.replace("/" + file_name, "")
-    return ""
+    return get_inventory(str(base_dir)).find_path_prefix(file_name)
+
+
+def scan_dir(src, path):
+    """
+    Method to list a single directory
+
+    :param src: Source directory used for the ignore checks
+    :param path: Directory to list
+    :return: Tuple of files and the sub directories that are not ignored
+    """
+    files = []
+    dirs = []
+    matcher = get_matcher(src)
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    if not matcher.is_ignored(entry.path):
+                        files.append(entry.path)
+                    continue
+                # Like os.walk symlinks to directories are not followed
+                try:
+                    is_symlink = entry.is_symlink()
+                except OSError:
+                    is_symlink = False
+                if not is_symlink and not matcher.is_ignored(entry.path, True):
+                    dirs.append(entry.path)
+    except OSError:
+        pass
+    return files, dirs
+
+
+def walk_tree(src, path):
+    """
+    Method to collect the files under the given directory in the same order as
+    os.walk while skipping ignored directories
+
+    :param src: Source directory used for the ignore checks
+    :param path: Directory to walk
+    :return: List of files with full path
+    """
+    result = []
+    stack = [path]
+    while stack:
+        files, dirs = scan_dir(src, stack.pop())
+        result += files
+        stack += reversed(dirs)
+    return result
+
+
+def walk_files(src, workers=None):
+    """
+    Method to list all the files under the source directory. Unlike os.walk
+    ignored directories such as node_modules are pruned before descending
+    into them. Files matching the ignore patterns are skipped too. Top level directories can optionally be walked in parallel
+    which helps with large trees on network file systems
+
+    :param src: Source directory
+    :param workers: Number of threads to use. Defaults to SCAN_WALK_WORKERS or 1
+    :return: List of files with full path
+    """
+    if workers is None:
+        workers = int(config.get("SCAN_WALK_WORKERS", 1))
+    result, dirs = scan_dir(src, src)
+    if workers < 2 or len(dirs) < 2:
+        for d in dirs:
+            result += walk_tree(src, d)
+        return result
+    with ThreadPoolExecutor(max_workers=min(workers, len(dirs))) as pool:
+        for subtree_files in pool.map(lambda d: walk_tree(src, d), dirs):
+            result += subtree_files
+    return result
+
+
+def git_files(src):
+    """
+    Method to list the files tracked in the git index of the source directory.
+    Much faster than walking the tree and excludes any untracked build output
+
+    :param src: Source directory which is a git work tree
+    :return: List of files with full path
+    """
+    git = Git(src)
+    deleted = set(git.ls_files("-z", "--deleted").split("\0"))
+    matcher = get_matcher(src)
+    ignored_dirs = {"": False}
+
+    def is_dir_ignored(rel_dir):
+        if rel_dir not in ignored_dirs:
+            ignored_dirs[rel_dir] = is_dir_ignored(
+                os.path.dirname(rel_dir)
+            ) or matcher.is_ignored(rel_dir, True)
+        return ignored_dirs[rel_dir]
+
+    result = []
+    seen = set()
+    for line in git.ls_files("-z", "--stage").split("\0"):
+        if not line:
+            continue
+        meta, rel_path = line.split("\t", 1)
+        mode = meta.split(" ", 1)[0]
+        # Skip submodules, deleted files and the duplicates from merge conflicts
+        if mode == "160000" or rel_path in deleted or rel_path in seen:
+            continue
+        seen.add(rel_path)
+        if is_dir_ignored(os.path.dirname(rel_path)) or matcher.is_ignored(rel_path):
+            continue
+        fpath = os.path.join(src, rel_path)
+        # os.walk treats symlinks to directories as directories
+        if mode == "120000" and os.path.isdir(fpath):
+            continue
+        result.append(fpath)
+    return result
+
+
+def list_dir_cached(src, path, dir_cache, listed_at):
+    """
+    Method to list a single directory reusing the cached listing if the
+    directory has not changed since
+
+    :param src: Source directory used for the ignore checks
+    :param path: Directory to list
+    :param dir_cache: Dict of directory to a list of mtime, listing time, files
+    and sub directories from the previous scan
+    :param listed_at: Time of the current listing in nanoseconds
+    :return: Tuple of files, sub directories and the new cache entry. The
+    entry is None if the directory cannot be read
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return [], [], None
+    cached = dir_cache.get(path)
+    # A listing taken within the mtime granularity of the last change could
+    # miss files added later in the same tick
+    if (
+        cached
+        and len(cached) == 4
+        and cached[0] == mtime
+        and mtime < cached[1] - RACY_MTIME_NS
+    ):
+        files = [os.path.join(path, f) for f in cached[2]]
+        dirs = [os.path.join(path, d) for d in cached[3]]
+        return files, dirs, cached
+    files, dirs = scan_dir(src, path)
+    entry = [
+        mtime,
+        listed_at,
+        [os.path.basename(f) for f in files],
+        [os.path.basename(d) for d in dirs],
+    ]
+    return files, dirs, entry
+
+
+def walk_tree_cached(src, path, dir_cache, listed_at):
+    """
+    Method to list all the files under the given directory using the cached
+    directory listings
+
+    :param src: Source directory used for the ignore checks
+    :param path: Directory to walk
+    :param dir_cache: Dict of directory listings from the previous scan
+    :param listed_at: Time of the current listing in nanoseconds
+    :return: Tuple of files with full path, the new dir cache entries and a
+    boolean indicating if any directory has changed
+    """
+    result = []
+    new_cache = {}
+    changed = False
+    stack = [path]
+    while stack:
+        path = stack.pop()
+        files, dirs, entry = list_dir_cached(src, path, dir_cache, listed_at)
+        # Reused listings are returned as is
+        if entry is None or entry is not dir_cache.get(path):
+            changed = True
+        if entry is not None:
+            new_cache[path] = entry
+        result += files
+        stack += reversed(dirs)
+    return result, new_cache, changed
+
+
+def walk_files_cached(src, dir_cache, workers=None):
+    """
+    Method to list all the files under the source directory reusing the
+    listing of any directory whose mtime has not changed since the previous
+    scan. Only the directories need to be stat'ed when nothing has changed.
+    Like walk_files the top level directories can be walked in parallel
+
+    :param src: Source directory
+    :param dir_cache: Dict of directory to a list of mtime, listing time, files
+    and sub directories from the previous scan
+    :param workers: Number of threads to use. Defaults to SCAN_WALK_WORKERS or 1
+    :return: Tuple of files with full path, the new dir cache and a boolean
+    indicating if any directory has changed
+    """
+    if workers is None:
+        workers = int(config.get("SCAN_WALK_WORKERS", 1))
+    # time.time_ns is not available on python 3.6
+    listed_at = int(time.time() * 1e9)
+    result, dirs, entry = list_dir_cached(src, src, dir_cache, listed_at)
+    new_cache = {}
+    changed = entry is None or entry is not dir_cache.get(src)
+    if entry is not None:
+        new_cache[src] = entry
+
+    def walk_subtree(path):
+        return walk_tree_cached(src, path, dir_cache, listed_at)
+
+    if workers < 2 or len(dirs) < 2:
+        subtrees = [walk_subtree(d) for d in dirs]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(dirs))) as pool:
+            subtrees = list(pool.map(walk_subtree, dirs))
+    for files, subtree_cache, subtree_changed in subtrees:
+        result += files
+        new_cache.update(subtree_cache)
+        changed = changed or subtree_changed
+    if len(new_cache) != len(dir_cache):
+        changed = True
+    return result, new_cache, changed
 
 
 def find_python_reqfiles(path):
@@ -76,14 +320,7 @@ def find_python_reqfiles(path):
     Returns:
       List of python requirement files
     """
-    result = []
-    req_files = ["requirements.txt", "Pipfile", "Pipfile.lock", "conda.yml"]
-    for root, dirs, files in os.walk(path):
-        if not is_ignored_dir(path, root):
-            for name in req_files:
-                if name in files:
-                    result.append(os.path.join(root, name))
-    return result
+    return [f for f in walk_files(path) if os.path.basename(f) in python_req_files]
 
 
 def find_jar_files():
@@ -96,11 +333,7 @@ def find_jar_files():
         os.path.join(os.environ["HOME"], ".gradle", "caches"),
     ]
     for path in jar_lib_path:
-        for root, dirs, files in os.walk(path):
-            if not is_ignored_dir(path, root):
-                for file in files:
-                    if file.endswith(".jar"):
-                        result.append(os.path.join(root, file))
+        result += [f for f in walk_files(path) if f.endswith(".jar")]
     return result
 
 
@@ -112,17 +345,256 @@ def find_files(src, src_ext_name, use_start=False):
     :param use_start: Boolean to check for file prefix
     :return: List of files with full path
     """
+    # Use the inventory if one was already built for this directory
+    inventory = inventories.get(src)
+    if inventory:
+        return inventory.find_files(src_ext_name, use_start)
     result = []
-    for root, dirs, files in os.walk(src):
-        if not is_ignored_dir(src, root):
-            for file in files:
-                if file == src_ext_name or file.endswith(src_ext_name):
-                    result.append(os.path.join(root, file))
-                elif use_start and file.startswith(src_ext_name):
-                    result.append(os.path.join(root, file))
+    for fpath in walk_files(src):
+        file = os.path.basename(fpath)
+        if file == src_ext_name or file.endswith(src_ext_name):
+            result.append(fpath)
+        elif use_start and file.startswith(src_ext_name):
+            result.append(fpath)
     return result
 
 
+class FileInventory(object):
+    """
+    In-memory list of the files under a source directory along with indexes
+    by extension and by file name. The source directory is walked only once
+    and all the file lookups for the run get answered from memory
+    """
+
+    def __init__(self, src, files):
+        """
+        :param src: Source directory
+        :param files: List of files with full path in the order they were found
+        """
+        self.src = src
+        self.files = files
+        # Persistent cache details. See build
+        self.cache_file = None
+        self.dir_cache = {}
+        self.unchanged = False
+        self.project_types = {}
+        self.ext_index = {}
+        self.name_index = {}
+        for pos, fpath in enumerate(files):
+            name = os.path.basename(fpath)
+            self.name_index.setdefault(name, []).append(pos)
+            dot = name.rfind(".")
+            if dot > -1:
+                self.ext_index.setdefault(name[dot:], []).append(pos)
+
+    @classmethod
+    def build(cls, src):
+        """
+        Construct the inventory using the git index or by walking the source
+        directory. When walking, the directory listings and the detected
+        project types are persisted in the cache directory so that repeat
+        scans of the same checkout only list the directories that have changed
+
+        :param src: Source directory
+        :return: FileInventory instance
+        """
+        # Prefer the git index for git work trees
+        if config.get("SCAN_INVENTORY_BACKEND", "git") == "git" and os.path.exists(
+            os.path.join(src, ".git")
+        ):
+            try:
+                return cls(src, git_files(src))
+            except Exception as e:
+                LOG.debug("Unable to list the files from git index: {}".format(e))
+        cache_file = cache.get_cache_file("inventory", os.path.abspath(src))
+        if not cache_file:
+            return cls(src, walk_files(src))
+        ignore_key = cache.hash_key(*get_matcher(src).patterns)
+        cache_data = cache.load(cache_file)
+        if (
+            not cache_data
+            or cache_data.get("src") != src
+            or cache_data.get("ignore_key") != ignore_key
+        ):
+            cache_data = {}
+        files, dir_cache, changed = walk_files_cached(src, cache_data.get("dirs", {}))
+        inventory = cls(src, files)
+        inventory.cache_file = cache_file
+        inventory.dir_cache = dir_cache
+        inventory.unchanged = bool(cache_data) and not changed
+        if inventory.unchanged:
+            inventory.project_types = cache_data.get("project_types", {})
+        else:
+            LOG.debug("Updating the file inventory cache {}".format(cache_file))
+            inventory.save_cache(ignore_key)
+        return inventory
+
+    def save_cache(self, ignore_key=None):
+        """
+        Method to persist the inventory to the cache file
+
+        :param ignore_key: Hash of the ignore patterns used for the listing
+        """
+        if not self.cache_file:
+            return
+        if not ignore_key:
+            ignore_key = cache.hash_key(*get_matcher(self.src).patterns)
+        cache.save(
+            self.cache_file,
+            {
+                "src": self.src,
+                "ignore_key": ignore_key,
+                "dirs": self.dir_cache,
+                "project_types": self.project_types,
+            },
+        )
+
+    def find_files(self, src_ext_name, use_start=False):
+        """
+        Method to find files with given extension. Same as utils.find_files
+        but without walking the directory
+
+        :param src_ext_name: Extension
+        :param use_start: Boolean to check for file prefix
+        :return: List of files with full path
+        """
+        # Plain extensions such as .java can be answered from the extension index
+        if (
+            not use_start
+            and src_ext_name.startswith(".")
+            and "." not in src_ext_name[1:]
+        ):
+            return [self.files[pos] for pos in self.ext_index.get(src_ext_name, [])]
+        positions = []
+        for name, plist in self.name_index.items():
+            if name.endswith(src_ext_name) or (
+                use_start and name.startswith(src_ext_name)
+            ):
+                positions += plist
+        return [self.files[pos] for pos in sorted(positions)]
+
+    def find_by_name(self, file_name):
+        """
+        Method to find files with the given name
+
+        :param file_name: File name without any directory
+        :return: List of files with full path
+        """
+        return [self.files[pos] for pos in self.name_index.get(file_name, [])]
+
+    def find_path_prefix(self, file_name):
+        """
+        Method to find the directory prefix for a partial file path reported by
+        a tool. When several files share the same name, the file with the
+        longest matching path suffix wins
+
+        :param file_name: Relative file name. Eg: com/acme/Foo.java
+        :return: Path prefix relative to the source directory to be added to the filename
+        """
+        parts = Path(file_name).parts
+        if not parts:
+            return ""
+        best_parts = None
+        best_len = 0
+        for fpath in self.find_by_name(parts[-1]):
+            fparts = Path(os.path.relpath(fpath, self.src)).parts
+            matched = 0
+            for a, b in zip(reversed(fparts), reversed(parts)):
+                if a != b:
+                    break
+                matched += 1
+            if matched > best_len:
+                best_parts = fparts
+                best_len = matched
+        # The prefix is only meaningful when the whole reported path matched
+        if not best_parts or best_len < len(parts):
+            return ""
+        return "/".join(best_parts[: len(best_parts) - best_len])
+
+    def find_python_reqfiles(self):
+        """
+        Method to find python requirements files
+
+        :return: List of python requirement files
+        """
+        positions = []
+        for name in python_req_files:
+            positions += self.name_index.get(name, [])
+        return [self.files[pos] for pos in sorted(positions)]
+
+
+class PathSuffixIndex(object):
+    """
+    Trie of the path components in reverse order. Used to resolve partial
+    paths reported by tools to the full path in time proportional to the
+    depth of the partial path
+    """
+
+    def __init__(self, file_path_list):
+        """
+        :param file_path_list: List of files with full path. When several files
+        share a suffix, the first one in the list wins
+        """
+        # Each node is a list of the first full path and the child nodes
+        self.root = [None, {}]
+        for fpath in file_path_list:
+            node = self.root
+            for part in reversed(fpath.replace("\\", "/").split("/")):
+                if not part:
+                    continue
+                child = node[1].get(part)
+                if child is None:
+                    child = [fpath, {}]
+                    node[1][part] = child
+                node = child
+
+    def lookup(self, file_name):
+        """
+        Method to find the full path for the given partial path
+
+        :param file_name: Partial path. Eg: io/acme/Foo.java
+        :return: Full path or None if no file ends with the partial path
+        """
+        node = self.root
+        for part in reversed(file_name.replace("\\", "/").split("/")):
+            if not part or part == ".":
+                continue
+            node = node[1].get(part)
+            if node is None:
+                return None
+        return node[0]
+
+
+def get_inventory(src):
+    """
+    Method to retrieve the file inventory for the given source directory. The
+    inventory gets built on first use and is shared for the rest of the run
+
+    :param src: Source directory
+    :return: FileInventory instance
+    """
+    with inventory_lock:
+        inventory = inventories.get(src)
+        if inventory is None:
+            inventory = FileInventory.build(src)
+            inventories[src] = inventory
+        return inventory
+
+
+def reset_inventory(src=None):
+    """
+    Method to discard the inventory so that it gets rebuilt on next use. Useful
+    when the source directory has changed. Eg: after an automatic build
+
+    :param src: Source directory. All inventories are discarded if None
+    """
+    with inventory_lock:
+        if src is None:
+            inventories.clear()
+        else:
+            inventories.pop(src, None)
+
+
 def find_java_artifacts(search_dir):
     """
     Method to find java artifacts in the given directory
@@ -168,6 +640,30 @@ def detect_project_type(src_dir, scan_mode):
 
     :param src_dir: Source directory
 
+    :return List of detected types
+    """
+    inventory = get_inventory(src_dir)
+    # Reuse the types detected by the previous scan if nothing has changed
+    types_key = "{}:{}:{}".format(
+        scan_mode,
+        bool(os.environ.get("SHIFTLEFT_LANG_JAVA")),
+        bool(os.environ.get("SHIFTLEFT_LANG_CSHARP")),
+    )
+    if types_key in inventory.project_types:
+        return list(inventory.project_types[types_key])
+    project_types = find_project_types(inventory, scan_mode)
+    if inventory.cache_file:
+        inventory.project_types[types_key] = project_types
+        inventory.save_cache()
+    return list(project_types)
+
+
+def find_project_types(inventory, scan_mode):
+    """Method to find the project types based on the files in the inventory
+
+    :param inventory: Inventory of the source directory
+    :param scan_mode: Scan mode string
+
     :return List of detected types
     """
     project_types = []
@@ -176,65 +672,99 @@ def detect_project_type(src_dir, scan_mode):
     else:
         project_types.append("credscan")
     depscan_supported = False
-    if find_files(src_dir, ".cls"):
+    if inventory.find_files(".cls"):
         project_types.append("apex")
-    if find_python_reqfiles(src_dir) or find_files(src_dir, ".py"):
+    if inventory.find_python_reqfiles() or inventory.find_files(".py"):
         project_types.append("python")
         depscan_supported = True
-    if find_files(src_dir, ".sql"):
+    if inventory.find_files(".sql"):
         project_types.append("plsql")
-    if find_files(src_dir, ".scala"):
+    if inventory.find_files(".scala"):
         project_types.append("scala")
     if (
-        find_files(src_dir, "pom.xml")
-        or find_files(src_dir, ".gradle")
+        inventory.find_files("pom.xml")
+        or inventory.find_files(".gradle")
         or os.environ.get("SHIFTLEFT_LANG_JAVA")
     ):
         project_types.append("java")
         depscan_supported = True
-    if find_files(src_dir, ".jsp"):
+    if inventory.find_files(".jsp"):
         project_types.append("jsp")
         depscan_supported = True
     if (
-        find_files(src_dir, "package.json")
-        or find_files(src_dir, "yarn.lock")
-        or find_files(src_dir, ".js")
+        inventory.find_files("package.json")
+        or inventory.find_files("yarn.lock")
+        or inventory.find_files(".js")
     ):
         project_types.append("nodejs")
         depscan_supported = True
     if (
-        find_files(src_dir, ".csproj")
-        or find_files(src_dir, ".sln")
+        inventory.find_files(".csproj")
+        or inventory.find_files(".sln")
         or os.environ.get("SHIFTLEFT_LANG_CSHARP")
     ):
         project_types.append("csharp")
         depscan_supported = True
-    if find_files(src_dir, "go.sum") or find_files(src_dir, "Gopkg.lock"):
+    if inventory.find_files("go.sum") or inventory.find_files("Gopkg.lock"):
         project_types.append("go")
         depscan_supported = True
-    if find_files(src_dir, "Cargo.lock"):
+    if inventory.find_files("Cargo.lock"):
         project_types.append("rust")
         depscan_supported = True
-    if find_files(src_dir, ".tf"):
+    if inventory.find_files(".tf"):
         project_types.append("terraform")
-    if find_files(src_dir, ".yaml"):
+    if inventory.find_files(".yaml"):
         project_types.append("yaml")
     if (
-        find_files(src_dir, ".component")
-        or find_files(src_dir, ".cmp")
-        or find_files(src_dir, ".page")
+        inventory.find_files(".component")
+        or inventory.find_files(".cmp")
+        or inventory.find_files(".page")
     ):
         project_types.append("vf")
-    if find_files(src_dir, ".vm"):
+    if inventory.find_files(".vm"):
         project_types.append("vm")
         depscan_supported = True
-    if find_files(src_dir, ".sh"):
+    if inventory.find_files(".sh"):
         project_types.append("bash")
     if depscan_supported and scan_mode != "ide":
         project_types.append("depscan")
     return project_types
 
 
+def get_cpu_count():
+    """
+    Method to find the number of cpus available to this process. Any cpu affinity
+    and cgroup quota imposed by the container runtime is taken into account
+
+    :return: Number of usable cpus (minimum 1)
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    quota = None
+    try:
+        # cgroup v2
+        with open("/sys/fs/cgroup/cpu.max") as fp:
+            max_str, period_str = fp.read().strip().split(" ")
+            if max_str != "max":
+                quota = int(max_str) / int(period_str)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as fp:
+                quota_us = int(fp.read().strip())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as fp:
+                period_us = int(fp.read().strip())
+            if quota_us > 0 and period_us > 0:
+                quota = quota_us / period_us
+        except (OSError, ValueError):
+            quota = None
+    if quota:
+        count = min(count, math.ceil(quota))
+    return max(1, count)
+
+
 def get_report_file(tool_name, reports_dir, convert, ext_name="json"):
     """
     Method to construct a report filename
@@ -318,14 +848,16 @@ def calculate_line_hash(filename, lineno, line):
     """
     Method to calculate line hash
 
-    :param lineno: Line number
+    :param lineno: Line number. Pass None for a hash that survives line shifts
     :param filename: File name
     :param line: Line to hash
     :return: Hash based on blake2b algorithm
     """
-    snippet = "{}:{}:{}".format(
-        lineno, filename, line.strip().replace("\t", "").replace("\n", "")
-    )
+    line = line.strip().replace("\t", "").replace("\n", "")
+    if lineno is None:
+        snippet = "{}:{}".format(filename, line)
+    else:
+        snippet = "{}:{}:{}".format(lineno, filename, line)
     h = blake2b(digest_size=HASH_DIGEST_SIZE)
     h.update(snippet.encode())
     return h.hexdigest()
@@ -13,9 +13,10 @@
 # You should have received a copy of the GNU General Public License
 # along with Scan.  If not, see <https://www.gnu.org/licenses/>.
 
-from defusedxml.ElementTree import parse
+from defusedxml.ElementTree import iterparse
 
 from lib.constants import PRIORITY_MAP
+from lib.utils import PathSuffixIndex
 
 
 def get_report_data(xmlfile, file_path_list=[]):
@@ -24,52 +25,87 @@ def get_report_data(xmlfile, file_path_list=[]):
     :param xmlfile: xml file to parse
     :param file_path_list: Full file path for any manipulation
     """
-    issues = []
     metrics = {}
+    issues = list(iter_report_data(xmlfile, file_path_list, metrics))
+    return issues, metrics
+
+
+def get_bug_instance(child, resolve_path):
+    """Convert a BugInstance element into an issue
+
+    :param child: BugInstance element
+    :param resolve_path: Function returning the full path of a source path
+
+    :return: issue dict
+    """
+    issue = dict(child.attrib)
+    if "priority" in child.attrib:
+        priority = child.attrib["priority"]
+        if priority in PRIORITY_MAP:
+            issue["issue_severity"] = PRIORITY_MAP.get(priority, priority)
+    if "cweid" in child.attrib and child.attrib["cweid"]:
+        issue["test_id"] = "CWE-" + child.attrib["cweid"]
+    elif "type" in child.attrib and child.attrib["type"]:
+        issue["test_id"] = child.attrib["type"]
+    for ele in child.iter():
+        if ele.tag.lower() == "ShortMessage".lower():
+            issue["title"] = ele.text
+        if ele.tag.lower() == "LongMessage".lower():
+            issue["description"] = ele.text
+        if ele.tag.lower() == "Message".lower():
+            issue["description"] = issue["description"] + " \n" + ele.text
+        if ele.tag.lower() == "SourceLine".lower() and (
+            ele.attrib.get("synthetic") == "true" or ele.attrib.get("primary") == "true"
+        ):
+            issue["line"] = ele.attrib["start"]
+            issue["filename"] = resolve_path(ele.attrib["sourcepath"])
+    return issue
+
+
+def iter_report_data(xmlfile, file_path_list=[], metrics=None):
+    """Parse the xml file incrementally and yield one issue per BugInstance.
+    Processed elements are cleared so that the memory usage does not grow
+    with the size of the report
+
+    :param xmlfile: xml file to parse
+    :param file_path_list: Full file path for any manipulation
+    :param metrics: Optional dict to be filled with the summary metrics
+    """
     file_ref = {}
     if not file_path_list:
         file_path_list = []
-    et = parse(xmlfile)
-    root = et.getroot()
-    for child in root:
-        issue = {}
-        if child.tag.lower() == "BugInstance".lower():
-            issue = child.attrib
-            if "priority" in child.attrib:
-                priority = child.attrib["priority"]
-                if priority in PRIORITY_MAP:
-                    issue["issue_severity"] = PRIORITY_MAP.get(priority, priority)
-            if "cweid" in child.attrib and child.attrib["cweid"]:
-                issue["test_id"] = "CWE-" + child.attrib["cweid"]
-            elif "type" in child.attrib and child.attrib["type"]:
-                issue["test_id"] = child.attrib["type"]
-            for ele in child.iter():
-                if ele.tag.lower() == "ShortMessage".lower():
-                    issue["title"] = ele.text
-                if ele.tag.lower() == "LongMessage".lower():
-                    issue["description"] = ele.text
-                if ele.tag.lower() == "Message".lower():
-                    issue["description"] = issue["description"] + " \n" + ele.text
-                if ele.tag.lower() == "SourceLine".lower() and (
-                    ele.attrib.get("synthetic") == "true"
-                    or ele.attrib.get("primary") == "true"
-                ):
-                    issue["line"] = ele.attrib["start"]
-                    fname = ele.attrib["sourcepath"]
-                    if fname in file_ref:
-                        fname = file_ref[fname]
-                    else:
-                        # FIXME: This logic is too slow.
-                        # Tools like find-sec-bugs are not reliably reporting the full path
-                        # so such a lookup is required
-                        for tf in file_path_list:
-                            if tf.endswith(fname):
-                                file_ref[fname] = tf
-                                fname = tf
-                                break
-                    issue["filename"] = fname
-            issues.append(issue)
-        if child.tag.lower() == "FindBugsSummary".lower():
-            metrics = {"summary": child.attrib}
+    # Tools like find-sec-bugs are not reliably reporting the full path
+    # so such a lookup is required
+    path_index = None
 
-    return issues, metrics
+    def resolve_path(fname):
+        nonlocal path_index
+        if fname in file_ref:
+            return file_ref[fname]
+        if file_path_list:
+            if path_index is None:
+                path_index = PathSuffixIndex(file_path_list)
+            full_path = path_index.lookup(fname) or fname
+            file_ref[fname] = full_path
+            return full_path
+        return fname
+
+    depth = 0
+    root = None
+    for event, child in iterparse(xmlfile, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = child
+            depth += 1
+            continue
+        depth -= 1
+        # Only the direct children of the root are of interest
+        if depth != 1:
+            continue
+        tag = child.tag.lower()
+        if tag == "BugInstance".lower():
+            yield get_bug_instance(child, resolve_path)
+        elif tag == "FindBugsSummary".lower() and metrics is not None:
+            metrics["summary"] = dict(child.attrib)
+        # Drop the processed elements including the references from the root
+        root.clear()
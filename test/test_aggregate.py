@@ -27,3 +27,21 @@ def test_aggregate():
             data = outfile.read()
             assert data
         os.unlink(afile.name)
+
+
+def test_sarif_aggregate():
+    test_sarif_files = find_test_data()
+
+    def run_data_iter():
+        for sf in test_sarif_files:
+            with open(sf, mode="r") as report_file:
+                yield from json.loads(report_file.read())["runs"]
+
+    with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=False) as afile:
+        aggregate.sarif_aggregate(run_data_iter(), afile.name)
+        afile.close()
+        with open(afile.name, "r") as outfile:
+            data = json.loads(outfile.read())
+            assert data["version"] == "2.1.0"
+            assert data["runs"] == list(run_data_iter())
+        os.unlink(afile.name)
@@ -0,0 +1,133 @@
+import os
+
+import lib.classpath as classpath
+import lib.utils as utils
+
+POM = """<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <groupId>{g}</groupId>
+  <artifactId>{a}</artifactId>
+  <version>{v}</version>
+  <properties>
+    <lib.version>1.2</lib.version>
+  </properties>
+  <dependencies>
+{deps}
+  </dependencies>
+</project>
+"""
+
+DEP = """    <dependency>
+      <groupId>{g}</groupId>
+      <artifactId>{a}</artifactId>
+      <version>{v}</version>
+      <scope>{scope}</scope>
+    </dependency>"""
+
+
+def add_artifact(m2, g, a, v, deps=""):
+    artifact_dir = m2.joinpath(*g.split("."), a, v)
+    artifact_dir.mkdir(parents=True)
+    (artifact_dir / "{}-{}.jar".format(a, v)).write_text("")
+    (artifact_dir / "{}-{}.pom".format(a, v)).write_text(
+        POM.format(g=g, a=a, v=v, deps=deps)
+    )
+    return str(artifact_dir / "{}-{}.jar".format(a, v))
+
+
+def test_resolve_classpath(tmp_path, monkeypatch):
+    home = tmp_path / "home"
+    m2 = home / ".m2" / "repository"
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("SCAN_CACHE_DIR", str(tmp_path / "cache"))
+    web_jar = add_artifact(
+        m2,
+        "org.acme",
+        "web",
+        "1.2",
+        DEP.format(g="org.acme", a="core", v="2.0", scope="compile")
+        + DEP.format(g="junit", a="junit", v="4.13", scope="test"),
+    )
+    core_jar = add_artifact(m2, "org.acme", "core", "2.0")
+    add_artifact(m2, "junit", "junit", "4.13")
+    unused_jar = add_artifact(m2, "org.acme", "unused", "1.0")
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "pom.xml").write_text(
+        POM.format(
+            g="com.example",
+            a="app",
+            v="1.0",
+            deps=DEP.format(g="org.acme", a="web", v="${lib.version}", scope="compile"),
+        )
+    )
+    utils.reset_inventory()
+    jars = classpath.resolve_classpath(str(src))
+    assert jars == [web_jar, core_jar]
+    assert unused_jar not in jars
+    # Second run is served from the cache
+    monkeypatch.setattr(
+        classpath,
+        "resolve_dependency_jars",
+        lambda build_files: [],
+    )
+    assert classpath.resolve_classpath(str(src)) == [web_jar, core_jar]
+    utils.reset_inventory()
+
+
+def test_resolve_classpath_missing(tmp_path, monkeypatch):
+    home = tmp_path / "home"
+    m2 = home / ".m2" / "repository"
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("SCAN_CACHE_DIR", str(tmp_path / "cache"))
+    core_jar = add_artifact(m2, "org.acme", "core", "2.0")
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "pom.xml").write_text(
+        POM.format(
+            g="com.example",
+            a="app",
+            v="1.0",
+            deps=DEP.format(g="org.acme", a="core", v="2.0", scope="compile")
+            + DEP.format(g="org.acme", a="web", v="1.2", scope="compile"),
+        )
+    )
+    utils.reset_inventory()
+    assert classpath.resolve_classpath(str(src)) == [core_jar]
+    # The missing dependency gets downloaded before the next run
+    web_jar = add_artifact(m2, "org.acme", "web", "1.2")
+    assert classpath.resolve_classpath(str(src)) == [core_jar, web_jar]
+    utils.reset_inventory()
+
+
+def test_gradle_dependencies(tmp_path, monkeypatch):
+    home = tmp_path / "home"
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("GRADLE_USER_HOME", raising=False)
+    gradle_dir = (
+        home
+        / ".gradle"
+        / "caches"
+        / "modules-2"
+        / "files-2.1"
+        / "com.google.guava"
+        / "guava"
+        / "29.0-jre"
+        / "abc123"
+    )
+    gradle_dir.mkdir(parents=True)
+    (gradle_dir / "guava-29.0-jre.jar").write_text("")
+    build_file = tmp_path / "build.gradle"
+    build_file.write_text("""dependencies {
+    implementation 'com.google.guava:guava:29.0-jre'
+    testImplementation "junit:junit:4.13"
+    api("org.missing:lib:1.0")
+}
+""")
+    deps = classpath.parse_gradle_dependencies(str(build_file))
+    assert deps == [
+        ("com.google.guava", "guava", "29.0-jre", False),
+        ("org.missing", "lib", "1.0", False),
+    ]
+    assert classpath.resolve_dependency_jars([str(build_file)]) == [
+        os.path.join(str(gradle_dir), "guava-29.0-jre.jar")
+    ]
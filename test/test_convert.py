@@ -11,8 +11,8 @@ import lib.issue as issueLib
 
 def test_nodejsscan_convert_empty():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report("nodejsscan", [], ".", {}, {}, [], cfile.name)
-        jsondata = json.loads(data)
+        convertLib.report("nodejsscan", [], ".", {}, {}, [], cfile.name)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert (
             jsondata["runs"][0]["automationDetails"]["description"]["text"]
             == "Static Analysis Security Test results using @ShiftLeft/sast-scan"
@@ -30,7 +30,7 @@ def test_nodejsscan_convert_empty():
 
 def test_nodejsscan_convert_issue():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report(
+        convertLib.report(
             "nodejsscan",
             [],
             ".",
@@ -50,7 +50,7 @@ def test_nodejsscan_convert_issue():
             ],
             cfile.name,
         )
-        jsondata = json.loads(data)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert (
             jsondata["runs"][0]["results"][0]["message"]["text"]
             == "MD5 is a a weak hash which is known to have collision. Use a strong hashing function."
@@ -59,7 +59,7 @@ def test_nodejsscan_convert_issue():
 
 def test_nodejsscan_convert_metrics():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report(
+        convertLib.report(
             "nodejsscan",
             [],
             ".",
@@ -75,7 +75,7 @@ def test_nodejsscan_convert_metrics():
             [],
             cfile.name,
         )
-        jsondata = json.loads(data)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert jsondata["runs"][0]["properties"]["metrics"]
 
 
@@ -94,7 +94,7 @@ def test_create_result():
     )
     data = convertLib.create_result("nodetest", issue, {}, {}, None, "/app/src")
     assert (
-        data.locations[0].physical_location.artifact_location.uri
+        data["locations"][0]["physicalLocation"]["artifactLocation"]["uri"]
         == "file:///app/src/CWE-916/examples/InsufficientPasswordHash.js"
     )
     # Override the workspace and check the location
@@ -102,7 +102,7 @@ def test_create_result():
     importlib.reload(convertLib)
     data = convertLib.create_result("nodetest", issue, {}, {}, None, "/app/src")
     assert (
-        data.locations[0].physical_location.artifact_location.uri
+        data["locations"][0]["physicalLocation"]["artifactLocation"]["uri"]
         == "file:///foo/bar/CWE-916/examples/InsufficientPasswordHash.js"
     )
     # Override the workspace and check the location
@@ -110,7 +110,7 @@ def test_create_result():
     importlib.reload(convertLib)
     data = convertLib.create_result("nodetest", issue, {}, {}, None, "/app/src")
     assert (
-        data.locations[0].physical_location.artifact_location.uri
+        data["locations"][0]["physicalLocation"]["artifactLocation"]["uri"]
         == "https://github.com/ShiftLeftSecurity/cdxgen/blob/master/CWE-916/examples/InsufficientPasswordHash.js"
     )
 
@@ -135,14 +135,14 @@ def test_create_result_relative():
     )
     data = convertLib.create_result("gitleaks", issue, {}, {}, None, "/app")
     assert (
-        data.locations[0].physical_location.artifact_location.uri
+        data["locations"][0]["physicalLocation"]["artifactLocation"]["uri"]
         == "src/main/README-new.md"
     )
 
 
 def test_credscan_convert_issue():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report(
+        convertLib.report(
             "credscan",
             [],
             ".",
@@ -165,7 +165,7 @@ def test_credscan_convert_issue():
             ],
             cfile.name,
         )
-        jsondata = json.loads(data)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert jsondata["runs"][0]["results"][0]["message"]["text"]
         assert jsondata["runs"][0]["properties"]["metrics"] == {
             "high": 1,
@@ -178,7 +178,7 @@ def test_credscan_convert_issue():
 
 def test_credscan_convert_unc():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report(
+        convertLib.report(
             "credscan",
             [],
             ".",
@@ -201,7 +201,7 @@ def test_credscan_convert_unc():
             ],
             cfile.name,
         )
-        jsondata = json.loads(data)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert jsondata["runs"][0]["results"][0]["message"]["text"]
         assert jsondata["runs"][0]["properties"]["metrics"] == {
             "high": 1,
@@ -214,7 +214,7 @@ def test_credscan_convert_unc():
 
 def test_gosec_convert_issue():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report(
+        convertLib.report(
             "gosec",
             [],
             ".",
@@ -233,7 +233,7 @@ def test_gosec_convert_issue():
             ],
             cfile.name,
         )
-        jsondata = json.loads(data)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert jsondata["runs"][0]["results"][0]["message"]["text"]
         assert jsondata["runs"][0]["properties"]["metrics"] == {
             "medium": 1,
@@ -247,7 +247,7 @@ def test_gosec_convert_issue():
 
 def test_tfsec_convert_issue():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report(
+        convertLib.report(
             "tfsec",
             [],
             ".",
@@ -268,7 +268,7 @@ def test_tfsec_convert_issue():
             ],
             cfile.name,
         )
-        jsondata = json.loads(data)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert (
             jsondata["runs"][0]["results"][0]["message"]["text"]
             == "Resource 'aws_security_group_rule.my-rule' should include a description for auditing purposes."
@@ -284,7 +284,7 @@ def test_tfsec_convert_issue():
 
 def test_checkov_convert_issue():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report(
+        convertLib.report(
             "checkov",
             [],
             ".",
@@ -325,7 +325,7 @@ def test_checkov_convert_issue():
             ],
             cfile.name,
         )
-        jsondata = json.loads(data)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert (
             jsondata["runs"][0]["results"][0]["message"]["text"]
             == "S3 Bucket has an ACL defined which allows public READ access."
@@ -341,7 +341,7 @@ def test_checkov_convert_issue():
 
 def test_staticcheck_convert_issue():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report(
+        convertLib.report(
             "staticcheck",
             [],
             ".",
@@ -366,7 +366,7 @@ def test_staticcheck_convert_issue():
             ],
             cfile.name,
         )
-        jsondata = json.loads(data)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert (
             jsondata["runs"][0]["results"][0]["message"]["text"]
             == "error strings should not be capitalized."
@@ -396,7 +396,7 @@ def test_to_uri():
 
 def test_inspect_convert_issue():
     with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=True) as cfile:
-        data = convertLib.report(
+        convertLib.report(
             "inspect",
             [],
             ".",
@@ -520,7 +520,7 @@ def test_inspect_convert_issue():
             ],
             cfile.name,
         )
-        jsondata = json.loads(data)
+        jsondata = json.loads(Path(cfile.name).read_text())
         assert jsondata
 
 
@@ -543,3 +543,212 @@ def test_inspect_extract_issue():
         "first_found": "86ad7190555ddb774563ac58d242919db87a0265",
         "issue_confidence": "HIGH",
     }
+
+
+def test_report_issue_generator(monkeypatch, tmp_path):
+    calls = []
+    get_code_lines = issueLib.Issue.get_code_lines
+
+    def counting_get_code_lines(self, *args, **kwargs):
+        calls.append(self.fname)
+        return get_code_lines(self, *args, **kwargs)
+
+    monkeypatch.setattr(issueLib.Issue, "get_code_lines", counting_get_code_lines)
+    issues = (
+        {
+            "filename": "app-{}.js".format(i),
+            "line": 3,
+            "severity": sev,
+            "title": "Weak Hash used - MD5",
+            "description": "MD5 is a a weak hash",
+        }
+        for i, sev in enumerate(["HIGH", "LOW", "LOW"])
+    )
+    crep_fname = tmp_path / "nodejsscan-report.sarif"
+    metrics = convertLib.report("nodejsscan", [], "", None, [], issues, str(crep_fname))
+    jsondata = json.loads(crep_fname.read_text())
+    assert len(jsondata["runs"][0]["results"]) == 3
+    assert metrics == {
+        "total": 3,
+        "critical": 0,
+        "high": 1,
+        "medium": 0,
+        "low": 2,
+    }
+    assert jsondata["runs"][0]["properties"]["metrics"] == metrics
+    # The html report is rendered from the spooled results
+    html = (tmp_path / "nodejsscan-report.html").read_text()
+    assert all("app-{}.js".format(i) in html for i in range(3))
+    assert len(jsondata["runs"][0]["tool"]["driver"]["rules"]) == 1
+    assert calls == ["app-0.js", "app-1.js", "app-2.js"]
+
+
+def test_issue_as_finding():
+    issues = [
+        issueLib.issue_from_dict(
+            {
+                "filename": "".join(["src/", "app.js"]),
+                "line": i,
+                "severity": "high",
+                "title": "Weak Hash used - MD5",
+            }
+        )
+        for i in range(2)
+    ]
+    findings = [i.as_finding(with_code=False) for i in issues]
+    assert findings[0].filename is findings[1].filename
+    assert findings[0]["issue_severity"] == "HIGH"
+    assert findings[1].get("line_number") == 1
+    assert findings[0].as_dict() == dict(issues[0].as_dict(with_code=False), code=None)
+    assert not hasattr(issues[0], "__dict__")
+
+
+def test_result_fingerprint(tmp_path):
+    src = tmp_path / "app.js"
+    src.write_text("var a = 1;\nvar hash = md5(a);\nvar hash = md5(a);\n")
+
+    def fingerprints(line_numbers):
+        issues = [
+            {
+                "filename": str(src),
+                "line": line,
+                "severity": "HIGH",
+                "title": "Weak Hash used - MD5",
+            }
+            for line in line_numbers
+        ]
+        crep_fname = tmp_path / "nodejsscan-report.sarif"
+        convertLib.report(
+            "nodejsscan", [], str(tmp_path), None, [], issues, str(crep_fname)
+        )
+        return [
+            r["partialFingerprints"]["primaryLocationLineHash"]
+            for r in json.loads(crep_fname.read_text())["runs"][0]["results"]
+        ]
+
+    before = fingerprints([2, 3])
+    assert before[0] != before[1]
+    assert before[0].endswith(":1") and before[1].endswith(":2")
+    # Shift the lines and ensure the fingerprints remain the same
+    convertLib.snippets.clear()
+    src.write_text("// header\n\nvar a = 1;\nvar hash = md5(a);\nvar hash = md5(a);\n")
+    assert fingerprints([4, 5]) == before
+    convertLib.snippets.clear()
+
+
+def test_result_fingerprint_batch(tmp_path, monkeypatch):
+    src = tmp_path / "app.js"
+    src.write_text("var a = 1;\nvar hash = md5(a);\nvar hash = md5(a);\n")
+    calls = []
+    get_fingerprints = convertLib.snippets.get_fingerprints
+
+    def counting_get_fingerprints(path, file_name, linenos):
+        calls.append(list(linenos))
+        return get_fingerprints(path, file_name, linenos)
+
+    monkeypatch.setattr(
+        convertLib.snippets, "get_fingerprints", counting_get_fingerprints
+    )
+    issues = [
+        {
+            "filename": str(src),
+            "line": line,
+            "severity": "HIGH",
+            "title": "Weak Hash used - MD5",
+        }
+        for line in [1, 2, 3]
+    ]
+    crep_fname = tmp_path / "nodejsscan-report.sarif"
+    convertLib.report(
+        "nodejsscan", [], str(tmp_path), None, [], issues, str(crep_fname)
+    )
+    results = json.loads(crep_fname.read_text())["runs"][0]["results"]
+    assert calls == [[1, 2, 3]]
+    assert [
+        r["partialFingerprints"]["primaryLocationLineHash"][-2:] for r in results
+    ] == [":1", ":1", ":2"]
+    convertLib.snippets.clear()
+
+
+def test_path_rewriter():
+    rewriter = convertLib.PathRewriter("/work/c++ (v1.0)")
+    assert (
+        rewriter.to_uri("src/main.cpp")
+        == "file:///work/c%2B%2B%20%28v1.0%29/src/main.cpp"
+    )
+    rewriter = convertLib.PathRewriter("/work/c++ (v1.0)", "")
+    assert rewriter.to_uri("/work/c++ (v1.0)/src/main.cpp") == "src/main.cpp"
+    assert (
+        rewriter.to_uri("/work/cxx (v1.0)/src/main.cpp")
+        == "file:///work/cxx%20%28v1.0%29/src/main.cpp"
+    )
+    rewriter = convertLib.PathRewriter(
+        "/work/app", "https://github.com/acme/app/blob/master"
+    )
+    assert (
+        rewriter.to_uri("/work/app/src/main.py")
+        == "https://github.com/acme/app/blob/master/src/main.py"
+    )
+    assert (
+        rewriter.to_uri("src/main.py")
+        == "https://github.com/acme/app/blob/master/src/main.py"
+    )
+    assert rewriter.uris == {
+        "/work/app/src/main.py": "https://github.com/acme/app/blob/master/src/main.py",
+        "src/main.py": "https://github.com/acme/app/blob/master/src/main.py",
+    }
+
+
+def test_rule_descriptor_cache():
+    issue_dict = {
+        "test_id": "G101",
+        "test_name": "",
+        "issue_text": "Potential hardcoded credentials",
+        "issue_severity": "HIGH",
+    }
+    rule, index = convertLib.create_or_find_rule("gosec", issue_dict, {}, {})
+    assert index == 0
+    assert rule["name"] == "Hardcoded credentials"
+    assert rule["shortDescription"]["text"] == "Look for hard coded credentials."
+    assert rule["helpUri"].startswith("https://stackoverflow.com/")
+    assert rule["defaultConfiguration"]["level"] == "error"
+    # The same descriptor is shared across reports
+    other, _ = convertLib.create_or_find_rule("gosec", dict(issue_dict), {}, {})
+    assert other is rule
+    # The pack is specific to the tool
+    rule, _ = convertLib.create_or_find_rule("staticcheck", issue_dict, {}, {})
+    assert rule["name"] == ""
+    assert rule["shortDescription"]["text"] == "Rule G101 from staticcheck."
+    # Unknown ids keep the generic text
+    issue_dict["test_id"] = "X1"
+    rule, _ = convertLib.create_or_find_rule("gosec", issue_dict, {}, {})
+    assert rule["name"] == ""
+    assert rule["shortDescription"]["text"] == "Rule X1 from gosec."
+    assert rule["helpUri"].startswith("https://stackoverflow.com/")
+
+
+def test_gitignored_secret_reported(tmp_path):
+    (tmp_path / ".gitignore").write_text(".env\n*.pem\n")
+    (tmp_path / ".sastscanignore").write_text("fixtures/\n")
+    (tmp_path / ".env").write_text("AWS_SECRET=abcd\n")
+    (tmp_path / "fixtures").mkdir()
+    (tmp_path / "fixtures" / "fake.env").write_text("AWS_SECRET=abcd\n")
+    issues = [
+        {
+            "line": "AWS_SECRET=abcd",
+            "offender": "AWS_SECRET=abcd",
+            "commit": "f5cf9d795d00ac5540f3ba26a1d98d9bc9c4bbbc",
+            "rule": "AWS Secret Key",
+            "file": file_name,
+            "tags": "key, AWS",
+        }
+        for file_name in (".env", "fixtures/fake.env")
+    ]
+    crep_fname = str(tmp_path / "credscan-report.sarif")
+    convertLib.report("credscan", [], str(tmp_path), {}, {}, issues, crep_fname)
+    with open(crep_fname) as fp:
+        results = json.load(fp)["runs"][0]["results"]
+    # Committed files matching .gitignore are still reported
+    assert len(results) == 1
+    uri = results[0]["locations"][0]["physicalLocation"]["artifactLocation"]["uri"]
+    assert uri.endswith(".env") and "fixtures" not in uri
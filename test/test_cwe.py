@@ -1,4 +1,6 @@
-from lib.cwe import get, get_description
+import json
+
+from lib.cwe import cwe_index_file, get, get_description, read_csv_index
 
 
 def test_cwe_get():
@@ -14,3 +16,12 @@ def test_cwe_get():
 def test_cwe_get_desc():
     data = get_description("cwe-78")
     assert data
+
+
+def test_cwe_index():
+    # The committed index must be regenerated whenever the csv files change
+    with open(cwe_index_file) as f:
+        index = json.load(f)
+    assert index == read_csv_index()
+    assert index["78"][0] == get("CWE-78")["Name"]
+    assert get("cwe-0") is None
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import lib.executor as executor
+
+
+def test_run_tasks_order():
+    def work(name, delay):
+        time.sleep(delay)
+        return name
+
+    tasks = [
+        ("a", work, ("a1", 0.05)),
+        ("b", work, ("b1", 0)),
+        ("a", work, ("a2", 0)),
+    ]
+    assert executor.run_tasks(tasks, 1) == ["a1", "b1", "a2"]
+    assert executor.run_tasks(tasks, 4) == ["a1", "b1", "a2"]
+
+
+def test_run_tasks_same_key_sequential():
+    running = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def work(name):
+        with lock:
+            if running:
+                overlaps.append(name)
+            running.append(name)
+        time.sleep(0.02)
+        with lock:
+            running.remove(name)
+
+    tasks = [("checkov", work, ("checkov-{}".format(i),)) for i in range(3)]
+    executor.run_tasks(tasks, 4)
+    assert not overlaps
+
+
+def test_execute_default_cmd_once(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(
+        executor, "exec_tool", lambda args, cwd=None, stdout=None: calls.append(args)
+    )
+    executor.reset_executed_cmds()
+    cmd = ["checkov", "-s", "--quiet", "-o", "json", "-d", "%(src)s"]
+    for type_str in ("aws", "terraform", "yaml"):
+        executor.execute_default_cmd(
+            cmd, type_str, "checkov", str(tmp_path), str(tmp_path), False, "", {}
+        )
+    assert len(calls) == 1
+    # Different tools are still executed
+    executor.execute_default_cmd(
+        cmd, "kubernetes", "kube", str(tmp_path), str(tmp_path), False, "", {}
+    )
+    assert len(calls) == 2
+    executor.reset_executed_cmds()
+    executor.execute_default_cmd(
+        cmd, "aws", "checkov", str(tmp_path), str(tmp_path), False, "", {}
+    )
+    assert len(calls) == 3
@@ -0,0 +1,45 @@
+import lib.ignore as ignore
+
+
+def test_ignore_directories():
+    matcher = ignore.IgnoreMatcher("/app", ["tests/", "node_modules/", ".git/"])
+    assert matcher.is_ignored("/app/tests", True)
+    assert matcher.is_ignored("/app/src/tests", True)
+    assert matcher.is_ignored("/app/src/tests/unit", True)
+    assert matcher.is_ignored("/app/src/tests/unit/test_foo.py")
+    assert matcher.is_ignored("src/node_modules/lodash/index.js")
+    assert not matcher.is_ignored("/app/testsuite", True)
+    assert not matcher.is_ignored("/app/src/tests.py")
+    assert not matcher.is_ignored("/app", True)
+    assert not matcher.is_ignored("/other/tests/foo.py")
+
+
+def test_gitignore_patterns():
+    matcher = ignore.IgnoreMatcher(
+        ".",
+        [
+            "# comment",
+            "",
+            "*.min.js",
+            "/build",
+            "docs/generated/",
+            "**/fixtures/**",
+            "log?.txt",
+        ],
+    )
+    assert matcher.is_ignored("./static/app.min.js")
+    assert not matcher.is_ignored("./static/app.js")
+    assert matcher.is_ignored("./build", True)
+    assert matcher.is_ignored("build/libs/app.jar")
+    assert not matcher.is_ignored("src/build", True)
+    assert matcher.is_ignored("docs/generated", True)
+    assert not matcher.is_ignored("docs/generated")
+    assert matcher.is_ignored("a/b/fixtures/data.json")
+    assert matcher.is_ignored("log1.txt")
+    assert not matcher.is_ignored("log10.txt")
+
+
+def test_negation():
+    matcher = ignore.IgnoreMatcher("/app", ["*.yaml", "!deploy.yaml"])
+    assert matcher.is_ignored("/app/values.yaml")
+    assert not matcher.is_ignored("/app/k8s/deploy.yaml")
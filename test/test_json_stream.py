@@ -0,0 +1,50 @@
+import io
+import json
+from pathlib import Path
+
+import lib.json_stream as json_stream
+
+
+def test_iter_path():
+    data = {
+        "summary": {"passed": 2, "text": 'a "quoted" ] value \\'},
+        "skipped": [[1, 2], {"x": [3]}],
+        "results": {
+            "passed_checks": [{"id": 1}],
+            "failed_checks": [1, "two", {"id": 3}],
+        },
+        "nums": [1.5e3, -2, True, None],
+    }
+    raw = json.dumps(data, indent=2)
+    for chunk_size in [1, 3, 7, 4096]:
+        stream = json_stream.JSONStream(io.StringIO(raw), chunk_size=chunk_size)
+        assert list(stream.iter_path(["results", "failed_checks"])) == [
+            1,
+            "two",
+            {"id": 3},
+        ]
+        stream = json_stream.JSONStream(io.StringIO(raw), chunk_size=chunk_size)
+        assert list(stream.iter_path(["nums"])) == data["nums"]
+
+
+def test_iter_issues():
+    data_dir = Path(__file__).parent / "data"
+    for tool_name, fname, expected in [
+        ("bandit", "bandit-report.json", lambda d: d["results"]),
+        ("checkov", "checkov-report.json", lambda d: d["results"]["failed_checks"]),
+        (
+            "nodejsscan",
+            "nodejsscan-report.json",
+            lambda d: [i for v in d["sec_issues"].values() for i in v],
+        ),
+    ]:
+        with open(data_dir / fname) as fp:
+            report_data = json.load(fp)
+        with open(data_dir / fname) as fp:
+            issues = list(json_stream.iter_issues(fp, tool_name))
+        assert issues
+        assert issues == expected(report_data)
+    assert list(json_stream.iter_issues(io.StringIO("[]"), "retire")) == []
+    assert list(json_stream.iter_issues(io.StringIO('[{"a": 1}]'), "retire")) == [
+        {"a": 1}
+    ]
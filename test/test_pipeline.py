@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import lib.pipeline as pipeline
+
+
+def find_test_data():
+    return Path(__file__).parent / "data"
+
+
+def test_convert_inline():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        crep_fname = os.path.join(tmpdir, "source-python-report.sarif")
+        pipeline.convert_file(
+            "bandit",
+            [],
+            tmpdir,
+            str(find_test_data() / "bandit-report.json"),
+            crep_fname,
+        )
+        assert os.path.exists(crep_fname)
+        assert pipeline.wait() == []
+
+
+def test_convert_pool():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        report_files = []
+        for tool in ["bandit", "checkov"]:
+            report_fname = os.path.join(tmpdir, tool + "-report.json")
+            shutil.copy(find_test_data() / (tool + "-report.json"), report_fname)
+            report_files.append(report_fname)
+        pipeline.start(2)
+        for tool, report_fname in zip(["bandit", "checkov"], report_files):
+            pipeline.convert_file(
+                tool,
+                [],
+                tmpdir,
+                report_fname,
+                report_fname.replace(".json", ".sarif"),
+                remove_report=True,
+            )
+        converted_files = pipeline.wait()
+        assert converted_files == [f.replace(".json", ".sarif") for f in report_files]
+        for report_fname, crep_fname in zip(report_files, converted_files):
+            assert not os.path.exists(report_fname)
+            with open(crep_fname) as fp:
+                assert json.load(fp)["runs"][0]["results"]
+
+
+def write_tool(bin_dir, name, code):
+    tool = bin_dir / name
+    tool.write_text("#!{}\nimport shutil, sys\n{}\n".format(sys.executable, code))
+    tool.chmod(tool.stat().st_mode | stat.S_IEXEC)
+
+
+def test_scan_jobs(tmp_path):
+    # Reports get converted while the other tools are being started
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    write_tool(
+        bin_dir,
+        "bandit",
+        "shutil.copy({!r}, sys.argv[-1])".format(
+            str(find_test_data() / "bandit-report.json")
+        ),
+    )
+    src = tmp_path / "src"
+    src.mkdir()
+    type_list = ["type{}".format(i) for i in range(12)]
+    scan_tools_args_map = {}
+    for i, type_str in enumerate(type_list):
+        if i % 2:
+            # Tools that are not installed fail right away. Their empty
+            # output still gets converted
+            cmd = ["gosec", "-fmt=json", "%(src)s"]
+        else:
+            cmd = ["bandit", "-f", "json", "-o", "%(report_fname_prefix)s.json"]
+        scan_tools_args_map[type_str] = cmd
+    (src / ".sastscanrc").write_text(
+        json.dumps({"scan_tools_args_map": scan_tools_args_map})
+    )
+    reports_dir = tmp_path / "reports"
+    env = dict(os.environ, PATH=str(bin_dir) + os.pathsep + os.environ["PATH"])
+    subprocess.run(
+        [
+            sys.executable,
+            str(Path(__file__).parent.parent / "scan"),
+            "-i",
+            str(src),
+            "-o",
+            str(reports_dir),
+            "-t",
+            ",".join(type_list),
+            "--local-only",
+            "--no-error",
+            "-j",
+            "4",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        timeout=60,
+        check=True,
+    )
+    for type_str in type_list[::2]:
+        with open(reports_dir / "{}-report.sarif".format(type_str)) as fp:
+            assert json.load(fp)["runs"][0]["results"]
@@ -0,0 +1,101 @@
+import csv
+
+import lib.pmd as pmd
+
+
+def test_get_pmd_tool():
+    assert pmd.get_pmd_tool("apex") == "source-apex"
+    assert pmd.get_pmd_tool("plsql") == "source-sql"
+    assert pmd.get_pmd_tool("vf") == "source-vf"
+    assert not pmd.get_pmd_tool("terraform")
+    assert not pmd.get_pmd_tool("python")
+
+
+def test_split_report(tmp_path):
+    report_fname = tmp_path / "pmd-report.csv"
+    report_fname.write_text(
+        '"Problem","Package","File","Priority","Line","Description","Rule set","Rule"\n'
+        '"1","","/app/src/Foo.cls","3","10","Avoid debug statements","Performance","AvoidDebugStatements"\n'
+        '"2","","/app/pages/Foo.page","3","2","Avoid unescaped data","Security","VfUnescapeEl"\n'
+        '"3","","/app/src/Bar.CLS","3","4","Avoid debug statements","Performance","AvoidDebugStatements"\n'
+        '"4","","/app/pom.xml","3","1","Unexpected file","Errorprone","MistypedCDATASection"\n'
+    )
+    report_files = pmd.split_report(
+        str(report_fname),
+        str(tmp_path),
+        ["source-apex", "source-vf", "source-vm"],
+        True,
+    )
+    assert sorted(report_files) == ["source-apex", "source-vf", "source-vm"]
+    with open(report_files["source-apex"], newline="") as fp:
+        rows = list(csv.reader(fp))
+    assert rows[0][2] == "File"
+    assert [r[0] for r in rows[1:]] == ["1", "3", "4"]
+    with open(report_files["source-vf"], newline="") as fp:
+        assert [r[0] for r in list(csv.reader(fp))[1:]] == ["2", "4"]
+    # Results for the other languages go to every report
+    with open(report_files["source-vm"], newline="") as fp:
+        assert [r[0] for r in list(csv.reader(fp))[1:]] == ["4"]
+
+
+def test_get_ruleset_extensions(tmp_path):
+    extensions = pmd.get_ruleset_extensions(pmd.get_ruleset())
+    for ext in (".cls", ".page", ".java", ".jsp", ".sql", ".vm", ".xml", ".xsl"):
+        assert ext in extensions
+    ruleset = tmp_path / "rules.xml"
+    ruleset.write_text(
+        '<ruleset><rule ref="category/apex/security.xml/ApexCRUDViolation"/>'
+        '<rule name="Custom" language="vf"/></ruleset>'
+    )
+    assert pmd.get_ruleset_extensions(str(ruleset)) == [
+        ".cls",
+        ".trigger",
+        ".page",
+        ".component",
+    ]
+
+
+def test_write_filelist(tmp_path):
+    src = tmp_path / "src"
+    (src / "classes").mkdir(parents=True)
+    (src / "node_modules" / "lib").mkdir(parents=True)
+    (src / "classes" / "Foo.cls").write_text("public class Foo {}")
+    (src / "classes" / "Foo.TRIGGER").write_text("trigger Foo on Account {}")
+    (src / "classes" / "Foo,Bar.cls").write_text("public class FooBar {}")
+    (src / "node_modules" / "lib" / "Bar.page").write_text("<apex:page/>")
+    (src / "pom.xml").write_text("<project/>")
+    (src / "README.md").write_text("# Foo")
+    (src / ".gitignore").write_text("node_modules\n")
+    ruleset = tmp_path / "rules.xml"
+    ruleset.write_text(
+        '<ruleset><rule ref="category/apex/security.xml/ApexCRUDViolation"/>'
+        '<rule ref="category/vf/security.xml/VfCsrf"/>'
+        '<rule ref="category/xml/errorprone.xml/MistypedCDATASection"/></ruleset>'
+    )
+    filelist_fname = tmp_path / "filelist.txt"
+    # Same files as PMD with -d src. Ignored directories are included
+    assert pmd.write_filelist(str(src), str(filelist_fname), str(ruleset)) == 4
+    assert filelist_fname.read_text().split("\n") == [
+        str(src / "pom.xml"),
+        str(src / "classes" / "Foo.TRIGGER"),
+        str(src / "classes" / "Foo.cls"),
+        str(src / "node_modules" / "lib" / "Bar.page"),
+    ]
+
+
+def test_use_incremental_cache(tmp_path, monkeypatch):
+    ruleset = tmp_path / "rules.xml"
+    ruleset.write_text("<ruleset/>")
+    cmd = ["run.sh", "pmd", "-no-cache", "-d", "/app", "-R", str(ruleset)]
+    monkeypatch.delenv("SCAN_PMD_CACHE_DIR", raising=False)
+    assert pmd.use_incremental_cache(cmd, "/app", "source-apex") == cmd
+    monkeypatch.setenv("SCAN_PMD_CACHE_DIR", str(tmp_path / "pmd-cache"))
+    cached_cmd = pmd.use_incremental_cache(cmd, "/app", "source-apex")
+    assert "-no-cache" not in cached_cmd
+    cache_file = cached_cmd[cached_cmd.index("-cache") + 1]
+    assert cache_file.startswith(str(tmp_path / "pmd-cache"))
+    assert cached_cmd == pmd.use_incremental_cache(cmd, "/app", "source-apex")
+    # Changes to the ruleset use a new cache
+    ruleset.write_text("<ruleset></ruleset>")
+    assert cached_cmd != pmd.use_incremental_cache(cmd, "/app", "source-apex")
+    assert cached_cmd != pmd.use_incremental_cache(cmd, "/app", "source-vf")
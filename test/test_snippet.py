@@ -0,0 +1,95 @@
+import linecache
+
+import lib.issue as issueLib
+import lib.snippet as snippet
+from lib.snippet import SnippetProvider
+
+
+def test_get_lines(tmp_path):
+    contents = {
+        "unix.py": "import os\n\nprint(os.getcwd())\nx = 1\n",
+        "dos.py": "a = 1\r\nb = 2\r\nc = 3",
+        "utf8.py": "s = 'héllo'\nt = '世界'\n",
+        "empty.py": "",
+    }
+    provider = SnippetProvider()
+    for fname, text in contents.items():
+        fpath = tmp_path / fname
+        fpath.write_bytes(text.encode("utf-8"))
+        expected = []
+        for lineno in range(1, 7):
+            line = linecache.getline(str(fpath), lineno)
+            if not line:
+                break
+            expected.append((lineno, line))
+        assert provider.get_lines(str(fpath), 1, 7) == expected
+        assert provider.get_lines(str(fpath), 2, 3) == expected[1:2]
+    assert provider.get_lines(str(tmp_path / "missing.py"), 1, 3) == []
+
+
+def test_lru_bound(tmp_path):
+    provider = SnippetProvider(max_bytes=100)
+    for i in range(5):
+        fpath = tmp_path / "f{}.txt".format(i)
+        fpath.write_text("line\n" * 10)
+        assert provider.get_lines(str(fpath), 10, 12) == [(10, "line\n")]
+        assert provider.held_bytes <= 100 or len(provider.files) == 1
+    assert list(provider.files.keys())[-1] == str(tmp_path / "f4.txt")
+    assert len(provider.files) < 5
+    provider.clear()
+    assert provider.held_bytes == 0
+
+
+def test_find_line(tmp_path):
+    fpath = tmp_path / "config.env"
+    fpath.write_text("# settings\n  API_KEY=abc \nDB_PASS=secret\nAPI_KEY=abc\n")
+    provider = SnippetProvider()
+    assert provider.find_line(str(fpath), "API_KEY=abc") == 2
+    assert provider.find_line(str(fpath), " DB_PASS=secret") == 3
+    assert provider.find_line(str(fpath), "TOKEN=xyz") is None
+    assert provider.find_line(str(tmp_path / "missing.env"), "API_KEY=abc") is None
+
+
+def test_snippet_based_issue(tmp_path):
+    fpath = tmp_path / "README.md"
+    fpath.write_text("# Demo\n\naws_secret = 'REDACTED'\n")
+    issue = issueLib.issue_from_dict(
+        {
+            "line": "aws_secret = 'REDACTED'",
+            "offender": "REDACTED",
+            "commit": "06fd7b1f844f88fb7821df498ce6d209cb9ad875",
+            "rule": "AWS Secret Key",
+            "commitMessage": "Add secret\n",
+            "file": str(fpath),
+        }
+    )
+    finding = issue.as_finding()
+    assert finding.line_number == 3
+    assert finding.code == [(3, "aws_secret = 'REDACTED'")]
+
+
+def test_mapped_files_bound(tmp_path, monkeypatch):
+    monkeypatch.setattr(snippet, "MMAP_MIN_BYTES", 50)
+    provider = SnippetProvider(max_maps=2)
+    small = tmp_path / "small.txt"
+    small.write_text("line\n")
+    assert provider.get_lines(str(small), 1, 2) == [(1, "line\n")]
+    assert not provider.files[str(small)].is_mapped()
+    assert provider.mapped_files == 0
+    for i in range(5):
+        fpath = tmp_path / "f{}.txt".format(i)
+        fpath.write_text("line\n" * 20)
+        assert provider.get_lines(str(fpath), 20, 21) == [(20, "line\n")]
+        assert provider.mapped_files <= 2
+    assert sum(1 for s in provider.files.values() if s.is_mapped()) == 2
+    provider.clear()
+    assert provider.mapped_files == 0
+
+
+def test_unreadable_file_not_cached(tmp_path):
+    provider = SnippetProvider()
+    fpath = tmp_path / "later.py"
+    assert provider.get_lines(str(fpath), 1, 2) == []
+    assert str(fpath) not in provider.files
+    fpath.write_text("x = 1\n")
+    assert provider.get_lines(str(fpath), 1, 2) == [(1, "x = 1\n")]
@@ -0,0 +1,80 @@
+import os
+import zipfile
+
+import lib.spotbugs as spotbugs
+import lib.xml_parser as xml_parser
+
+
+def test_find_module_dirs(tmp_path):
+    for module, count in (("core", 3), ("web", 1), ("empty", 0)):
+        class_dir = tmp_path / module / "target" / "classes" / "org"
+        class_dir.mkdir(parents=True)
+        (tmp_path / module / "pom.xml").write_text("<project/>")
+        for i in range(count):
+            (class_dir / "C{}.class".format(i)).write_text("")
+    (tmp_path / "pom.xml").write_text("<project/>")
+    build_files = [str(p) for p in sorted(tmp_path.rglob("pom.xml"))]
+    module_dirs = spotbugs.find_module_dirs(build_files)
+    assert sorted(module_dirs) == [
+        (os.path.join(str(tmp_path), "core", "target", "classes"), 3),
+        (os.path.join(str(tmp_path), "web", "target", "classes"), 1),
+    ]
+
+
+def test_find_residual_targets(tmp_path):
+    for module in ("core", "web"):
+        class_dir = tmp_path / module / "target" / "classes" / "org"
+        class_dir.mkdir(parents=True)
+        (class_dir / "App.class").write_text("")
+        (tmp_path / module / "pom.xml").write_text("<project/>")
+        (tmp_path / module / "src" / "main" / "java").mkdir(parents=True)
+        (tmp_path / module / "src" / "main" / "java" / "App.java").write_text("")
+    test_dir = tmp_path / "core" / "target" / "test-classes"
+    test_dir.mkdir()
+    (test_dir / "AppTest.class").write_text("")
+    legacy_dir = tmp_path / "legacy" / "classes" / "org"
+    legacy_dir.mkdir(parents=True)
+    (legacy_dir / "Old.class").write_text("")
+    (legacy_dir / "Older.class").write_text("")
+    with zipfile.ZipFile(str(tmp_path / "core" / "vendor.jar"), "w") as zf:
+        zf.writestr("org/Vendor.class", "")
+        zf.writestr("org/Other.class", "")
+    (tmp_path / "Tool.class").write_text("")
+    build_files = [str(p) for p in sorted(tmp_path.rglob("pom.xml"))]
+    module_dirs = spotbugs.find_module_dirs(build_files)
+    assert len(module_dirs) == 2
+    residual = spotbugs.find_residual_targets(str(tmp_path), module_dirs)
+    assert residual == [
+        (str(tmp_path / "Tool.class"), 1),
+        (str(tmp_path / "core" / "vendor.jar"), 2),
+        (str(tmp_path / "core" / "target" / "test-classes"), 1),
+        (str(tmp_path / "legacy"), 2),
+    ]
+    assert spotbugs.find_residual_targets(str(tmp_path), []) == [(str(tmp_path), 6)]
+
+
+def test_group_modules():
+    module_dirs = [("a", 10), ("b", 6), ("c", 5), ("d", 1)]
+    assert spotbugs.group_modules(module_dirs, 2) == [["a", "d"], ["b", "c"]]
+    assert spotbugs.group_modules(module_dirs, 8) == [["a"], ["b"], ["c"], ["d"]]
+    assert spotbugs.group_modules(module_dirs, 1) == [["a", "b", "c", "d"]]
+
+
+def test_merge_reports(tmp_path):
+    report_file = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), "data", "findsecbugs-report.xml"
+    )
+    issues, metrics = xml_parser.get_report_data(report_file)
+    merged_file = str(tmp_path / "class-report.xml")
+    count = spotbugs.merge_reports(
+        [report_file, str(tmp_path / "missing.xml"), report_file], merged_file
+    )
+    assert count == 2 * len(issues)
+    merged_issues, merged_metrics = xml_parser.get_report_data(merged_file)
+    assert merged_issues == issues + issues
+    assert int(merged_metrics["summary"]["total_bugs"]) == 2 * int(
+        metrics["summary"]["total_bugs"]
+    )
+    assert merged_metrics["summary"]["java_version"] == "11.0.5"
+    with open(merged_file) as fp:
+        assert fp.read().count("<BugPattern ") == 19
@@ -1,3 +1,10 @@
+import os
+import time
+from types import SimpleNamespace
+
+from git import Git
+
+import lib.config as config
 import lib.utils as utils
 
 
@@ -36,3 +43,188 @@ def test_get_workspace():
     assert (
         d == "https://dev.azure.com/appthreat/aio?_a=contents&version=GBdevelop&path="
     )
+
+
+def test_get_cpu_count():
+    assert utils.get_cpu_count() >= 1
+
+
+def test_inventory(tmp_path):
+    for f in [
+        "pom.xml",
+        "build.gradle",
+        "requirements.txt",
+        "src/main/App.java",
+        "src/main/app.js",
+        "src/lib/run.sh",
+        "node_modules/lib/index.js",
+        "depscan-report.json",
+    ]:
+        fpath = tmp_path / f
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        fpath.write_text("")
+    src = str(tmp_path)
+    queries = [
+        (".java", False),
+        (".js", False),
+        ("pom.xml", False),
+        (".gradle", False),
+        ("sh", False),
+        ("depscan", True),
+        (".rs", False),
+    ]
+    expected = [sorted(utils.find_files(src, q, s)) for q, s in queries]
+    expected_reqfiles = utils.find_python_reqfiles(src)
+    inventory = utils.get_inventory(src)
+    assert inventory is utils.get_inventory(src)
+    for (ext, use_start), files in zip(queries, expected):
+        assert sorted(inventory.find_files(ext, use_start)) == files
+    assert inventory.find_python_reqfiles() == expected_reqfiles
+    assert "java" in utils.detect_project_type(src, "ci")
+    utils.reset_inventory(src)
+    assert inventory is not utils.get_inventory(src)
+
+
+def test_walk_files(tmp_path):
+    for f in [
+        "a.py",
+        "src/b.py",
+        "src/deep/c/d.py",
+        "src/node_modules/e.js",
+        "src/tests/f.py",
+        "lib/g.py",
+        ".git/config",
+        "debug.log",
+        "logs/keep.log",
+        "logs/other.log",
+        "generated/h.py",
+    ]:
+        fpath = tmp_path / f
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        fpath.write_text("")
+    (tmp_path / ".sastscanignore").write_text("*.log\n!keep.log\n/generated\n")
+    os.symlink(str(tmp_path / "src"), str(tmp_path / "lib" / "src-link"))
+    src = str(tmp_path)
+    # node_modules, tests and .git are pruned, *.log is ignored except for the
+    # negated keep.log and symlinked directories are not followed
+    expected = [
+        os.path.join(src, f)
+        for f in [
+            ".sastscanignore",
+            "a.py",
+            "lib/g.py",
+            "logs/keep.log",
+            "src/b.py",
+            "src/deep/c/d.py",
+        ]
+    ]
+    assert sorted(utils.walk_files(src, 1)) == expected
+    assert sorted(utils.walk_files(src, 4)) == expected
+    files, dir_cache, _ = utils.walk_files_cached(src, {}, 1)
+    assert sorted(files) == expected
+    assert sorted(utils.walk_files_cached(src, {}, 4)[0]) == expected
+    assert sorted(utils.walk_files_cached(src, dir_cache, 4)[0]) == expected
+
+
+def test_inventory_cache(tmp_path, monkeypatch):
+    src_dir = tmp_path / "src"
+    for f in ["app/main.py", "app/lib/util.py", "web/index.js"]:
+        fpath = src_dir / f
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        fpath.write_text("")
+    src = str(src_dir)
+    monkeypatch.setattr(utils, "RACY_MTIME_NS", 0)
+    # Only time.time is available on python 3.6
+    monkeypatch.setattr(utils, "time", SimpleNamespace(time=time.time))
+    config.set("SCAN_CACHE_DIR", str(tmp_path / "cache"))
+    try:
+        utils.reset_inventory(src)
+        inventory = utils.get_inventory(src)
+        assert not inventory.unchanged
+        project_types = utils.detect_project_type(src, "ci")
+        assert "python" in project_types
+        utils.reset_inventory(src)
+        cached_inventory = utils.get_inventory(src)
+        assert cached_inventory.unchanged
+        assert cached_inventory.files == inventory.files
+        assert utils.detect_project_type(src, "ci") == project_types
+        (src_dir / "web" / "deploy.sh").write_text("")
+        os.utime(str(src_dir / "web"), ns=(1, 1))
+        utils.reset_inventory(src)
+        inventory = utils.get_inventory(src)
+        assert not inventory.unchanged
+        assert inventory.find_files(".sh") == [str(src_dir / "web" / "deploy.sh")]
+        assert "bash" in utils.detect_project_type(src, "ci")
+    finally:
+        config.set("SCAN_CACHE_DIR", None)
+        utils.reset_inventory(src)
+
+
+def test_walk_files_cached_racy(tmp_path, monkeypatch):
+    (tmp_path / "a.py").write_text("")
+    src = str(tmp_path)
+    files, dir_cache, changed = utils.walk_files_cached(src, {})
+    assert files == [str(tmp_path / "a.py")]
+    # File added within the same mtime tick as the previous listing
+    mtime = os.stat(src).st_mtime_ns
+    (tmp_path / "b.py").write_text("")
+    os.utime(src, ns=(mtime, mtime))
+    # Only time.time is available on python 3.6
+    now = time.time() + 60
+    monkeypatch.setattr(utils, "time", SimpleNamespace(time=lambda: now))
+    files, dir_cache, changed = utils.walk_files_cached(src, dir_cache)
+    assert changed
+    assert sorted(files) == [str(tmp_path / "a.py"), str(tmp_path / "b.py")]
+    # The new listing was taken long after the last change
+    files, dir_cache, changed = utils.walk_files_cached(src, dir_cache)
+    assert not changed
+    assert sorted(files) == [str(tmp_path / "a.py"), str(tmp_path / "b.py")]
+
+
+def test_inventory_git(tmp_path):
+    for f in ["app.py", "lib/util.py", "build/gen.py", "tests/test_app.py"]:
+        fpath = tmp_path / f
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        fpath.write_text("")
+    src = str(tmp_path)
+    git = Git(src)
+    git.init()
+    git.add("app.py", "lib/util.py", "tests/test_app.py")
+    utils.reset_inventory(src)
+    try:
+        assert sorted(utils.get_inventory(src).find_files(".py")) == [
+            str(tmp_path / "app.py"),
+            str(tmp_path / "lib" / "util.py"),
+        ]
+        config.set("SCAN_INVENTORY_BACKEND", "fs")
+        utils.reset_inventory(src)
+        assert str(tmp_path / "build" / "gen.py") in utils.find_files(src, ".py")
+    finally:
+        config.set("SCAN_INVENTORY_BACKEND", None)
+        utils.reset_inventory(src)
+
+
+def test_find_path_prefix(tmp_path):
+    for f in [
+        "web/src/main/java/io/acme/controller/Search.java",
+        "api/src/main/java/io/acme/service/Search.java",
+        "api/src/main/java/io/acme/Util.java",
+    ]:
+        fpath = tmp_path / f
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        fpath.write_text("")
+    src = str(tmp_path)
+    utils.reset_inventory(src)
+    assert (
+        utils.find_path_prefix(src, "io/acme/controller/Search.java")
+        == "web/src/main/java"
+    )
+    assert (
+        utils.find_path_prefix(src, "io/acme/service/Search.java")
+        == "api/src/main/java"
+    )
+    assert utils.find_path_prefix(src, "io/acme/Util.java") == "api/src/main/java"
+    assert utils.find_path_prefix(src, "api/src/main/java/io/acme/Util.java") == ""
+    assert utils.find_path_prefix(src, "io/other/Util.java") == ""
+    assert utils.find_path_prefix(src, "Missing.java") == ""
+    utils.reset_inventory(src)
@@ -16,3 +16,40 @@ def test_findsec_parse():
         assert len(metrics.keys()) == 1
         assert issues[0]["issue_severity"] == "HIGH"
         assert issues[0]["test_id"] == "CWE-78"
+
+
+def test_findsec_parse_file_paths():
+    file_path_list = [
+        "/app/webgoat-server/src/main/java/org/owasp/webgoat/StartWebGoat.java",
+        "/app/webgoat-container/src/main/java/org/owasp/webgoat/HammerHead.java",
+        "/app/webgoat-lessons/src/main/java/org/owasp/webgoat/HammerHead.java",
+    ]
+    with open(
+        os.path.join(
+            os.path.dirname(os.path.realpath(__file__)),
+            "data",
+            "findsecbugs-report.xml",
+        )
+    ) as rf:
+        issues, metrics = xml_parser.get_report_data(rf, file_path_list)
+        filenames = set([i["filename"] for i in issues])
+        assert file_path_list[1] in filenames
+        assert file_path_list[2] not in filenames
+        assert "org/owasp/webgoat/WebGoat.java" in filenames
+
+
+def test_findsec_iter_parse():
+    metrics = {}
+    with open(
+        os.path.join(
+            os.path.dirname(os.path.realpath(__file__)),
+            "data",
+            "findsecbugs-report.xml",
+        )
+    ) as rf:
+        issue_iter = xml_parser.iter_report_data(rf, metrics=metrics)
+        first_issue = next(issue_iter)
+        assert first_issue["test_id"] == "CWE-78"
+        assert not metrics
+        assert len(list(issue_iter)) == 84
+        assert metrics["summary"]